@@ -0,0 +1,304 @@
+"""
+Streaming audio capture and voice activity detection for the voice pipeline.
+
+One audio stream stays open for the whole session. A capture thread reads
+fixed-size frames, measures their energy once, and pushes them into a ring
+buffer, so no speech is dropped between utterances. A frame-level voice
+activity detector segments utterances from the ring as frames arrive: its
+thresholds follow the noise floor, the end of speech is declared after a
+tunable hangover, and segments with too little voiced audio are discarded
+before they reach the (expensive) recognizer.
+"""
+import audioop
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import speech_recognition as sr
+
+class EndOfStream(Exception):
+    """Raised when the audio source is exhausted before a phrase starts"""
+
+class FrameRing:
+    """Fixed-capacity ring of (frame, energy, captured_at) tuples; the oldest are overwritten"""
+
+    def __init__(self, capacity: int):
+        self.frames = deque(maxlen=capacity)
+        self.ready = threading.Condition()
+        self.closed = False
+        self.overruns = 0
+
+    def push(self, frame: bytes, energy: int, captured_at: float):
+        with self.ready:
+            if len(self.frames) == self.frames.maxlen:
+                self.overruns += 1
+            self.frames.append((frame, energy, captured_at))
+            self.ready.notify()
+
+    def pop(self, timeout: Optional[float] = None) -> Optional[Tuple[bytes, int, float]]:
+        """Next frame, or None if the ring is closed and drained or the wait timed out"""
+        with self.ready:
+            if not self.frames and not self.closed:
+                self.ready.wait(timeout)
+            if self.frames:
+                return self.frames.popleft()
+            return None
+
+    def clear(self):
+        with self.ready:
+            self.frames.clear()
+
+    def close(self):
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+
+class Utterance:
+    """A speech segment produced by the VAD, with its timing"""
+    __slots__ = ("frames", "sample_rate", "sample_width", "speech_start", "speech_end",
+                 "voiced_seconds", "last_voiced_at", "detected_at")
+
+    def __init__(self, frames: List[bytes], sample_rate: int, sample_width: int,
+                 speech_start: float, speech_end: float, voiced_seconds: float,
+                 last_voiced_at: float, detected_at: float):
+        self.frames = frames
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.speech_start = speech_start  # Stream time (s) of the first voiced frame
+        self.speech_end = speech_end  # Stream time (s) after the last voiced frame
+        self.voiced_seconds = voiced_seconds
+        self.last_voiced_at = last_voiced_at  # perf_counter() when the last voiced frame was captured
+        self.detected_at = detected_at  # perf_counter() when the segment was closed
+
+    @property
+    def audio(self) -> sr.AudioData:
+        return sr.AudioData(b"".join(self.frames), self.sample_rate, self.sample_width)
+
+    def timing(self) -> Dict[str, float]:
+        """Per-utterance timing in seconds, for tuning end-of-speech latency"""
+        return {
+            "speech_start": round(self.speech_start, 3),
+            "speech_duration": round(self.speech_end - self.speech_start, 3),
+            "voiced": round(self.voiced_seconds, 3),
+            "end_of_speech_latency": round(self.detected_at - self.last_voiced_at, 3),
+        }
+
+class VoiceActivityDetector:
+    """Frame-level energy VAD with an adaptive noise floor and end-of-speech hangover"""
+
+    def __init__(self, seconds_per_frame: float, sample_rate: int, sample_width: int,
+                 hangover: float = 0.6, onset: float = 0.1, pre_roll: float = 0.3,
+                 tail: float = 0.2, min_speech: float = 0.25, max_utterance: float = 10.0,
+                 start_ratio: float = 3.0, continue_ratio: float = 2.0,
+                 noise_floor: float = 100, noise_adaptation: float = 0.5,
+                 min_threshold: float = 50):
+        self.seconds_per_frame = seconds_per_frame
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.hangover_frames = max(1, int(math.ceil(hangover / seconds_per_frame)))
+        self.onset_frames = max(1, int(math.ceil(onset / seconds_per_frame)))
+        self.pre_roll_frames = max(self.onset_frames, int(math.ceil(pre_roll / seconds_per_frame)))
+        self.tail_frames = int(math.ceil(tail / seconds_per_frame))
+        self.min_speech = min_speech
+        self.max_utterance_frames = max(1, int(max_utterance / seconds_per_frame))
+        # Speech must clear start_ratio x noise to begin and continue_ratio x noise to continue
+        self.start_ratio = start_ratio
+        self.continue_ratio = continue_ratio
+        self.noise_floor = noise_floor
+        # Fraction of the gap to the current frame's energy the floor closes per second
+        self.noise_damping = (1 - noise_adaptation) ** seconds_per_frame
+        self.min_threshold = min_threshold
+        self.frame_index = 0
+        self.segments = 0
+        self.discarded = 0
+        self.reset()
+
+    def reset(self):
+        """Forget any partial segment (e.g. after audio was discarded)"""
+        self.speaking = False
+        self.pre_roll = deque(maxlen=self.pre_roll_frames)
+        self.onset_count = 0
+        self.frames = []
+        self.voiced = 0
+        self.silence = 0
+        self.speech_start = 0
+        self.last_voiced_at = 0.0
+
+    @property
+    def start_threshold(self) -> float:
+        return max(self.min_threshold, self.noise_floor * self.start_ratio)
+
+    @property
+    def continue_threshold(self) -> float:
+        return max(self.min_threshold, self.noise_floor * self.continue_ratio)
+
+    def calibrate(self, energies: List[int]):
+        """Seed the noise floor from a stretch of ambient audio"""
+        if energies:
+            self.noise_floor = sum(energies) / len(energies)
+        # Keep stream time aligned with the frames consumed for calibration
+        self.frame_index += len(energies)
+
+    def process(self, frame: bytes, energy: int, captured_at: float) -> Optional[Utterance]:
+        """Feed one frame; returns an Utterance when a speech segment closes"""
+        self.frame_index += 1
+        if not self.speaking:
+            self.pre_roll.append(frame)
+            if energy > self.start_threshold:
+                self.onset_count += 1
+                if self.onset_count >= self.onset_frames:
+                    # Speech onset: the pre-roll already holds the onset frames
+                    self.speaking = True
+                    self.frames = list(self.pre_roll)
+                    self.voiced = self.onset_count
+                    self.silence = 0
+                    self.speech_start = self.frame_index - self.onset_count
+                    self.last_voiced_at = captured_at
+            else:
+                self.onset_count = 0
+                # Only non-speech frames move the noise floor
+                self.noise_floor = self.noise_floor * self.noise_damping + energy * (1 - self.noise_damping)
+            return None
+
+        self.frames.append(frame)
+        if energy > self.continue_threshold:
+            self.voiced += 1
+            self.silence = 0
+            self.last_voiced_at = captured_at
+        else:
+            self.silence += 1
+        if self.silence >= self.hangover_frames or len(self.frames) >= self.max_utterance_frames:
+            return self.finish(time.perf_counter())
+        return None
+
+    def finish(self, detected_at: float) -> Optional[Utterance]:
+        """Close the current segment; non-speech segments are discarded (None)"""
+        if not self.speaking:
+            return None
+        frames = self.frames
+        # Keep a short tail of trailing silence, drop the rest of the hangover
+        trim = self.silence - self.tail_frames
+        if trim > 0:
+            frames = frames[:-trim]
+        spf = self.seconds_per_frame
+        voiced_seconds = self.voiced * spf
+        utterance = Utterance(
+            frames, self.sample_rate, self.sample_width,
+            speech_start=self.speech_start * spf,
+            speech_end=(self.frame_index - self.silence) * spf,
+            voiced_seconds=voiced_seconds,
+            last_voiced_at=self.last_voiced_at,
+            detected_at=detected_at
+        )
+        self.reset()
+        if voiced_seconds < self.min_speech:
+            self.discarded += 1
+            return None
+        self.segments += 1
+        return utterance
+
+class AudioCapture:
+    """Keeps one audio source open and feeds its frames into a ring buffer"""
+
+    def __init__(self, source_factory: Callable[[], sr.AudioSource] = sr.Microphone,
+                 ring_seconds: float = 30.0, **vad_options):
+        self.source_factory = source_factory
+        self.ring_seconds = ring_seconds
+        self.vad_options = vad_options
+        self.source = None
+        self.ring: Optional[FrameRing] = None
+        self.vad: Optional[VoiceActivityDetector] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """Open the audio source and start the capture thread"""
+        self.source = self.source_factory()
+        self.source.__enter__()
+        self.sample_rate = self.source.SAMPLE_RATE
+        self.sample_width = self.source.SAMPLE_WIDTH
+        self.chunk = self.source.CHUNK
+        self.seconds_per_frame = float(self.chunk) / self.sample_rate
+        self.ring = FrameRing(max(1, int(self.ring_seconds / self.seconds_per_frame)))
+        self.vad = VoiceActivityDetector(
+            self.seconds_per_frame, self.sample_rate, self.sample_width, **self.vad_options)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._capture, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        if self.source is not None:
+            self.source.__exit__(None, None, None)
+            self.source = None
+
+    def _capture(self):
+        """Capture thread: read frames and measure their energy once"""
+        try:
+            while not self.stop_event.is_set():
+                frame = self.source.stream.read(self.chunk)
+                if not frame:
+                    break  # End of stream (e.g. an audio file)
+                self.ring.push(frame, audioop.rms(frame, self.sample_width), time.perf_counter())
+        finally:
+            self.ring.close()
+
+    def calibrate(self, duration: float = 0.5):
+        """One-time ambient noise calibration from the first frames of the stream"""
+        frames = max(1, int(math.ceil(duration / self.seconds_per_frame)))
+        energies = []
+        for _ in range(frames):
+            item = self.ring.pop(timeout=1.0)
+            if item is None:
+                break
+            energies.append(item[1])
+        self.vad.calibrate(energies)
+
+    def discard_pending(self):
+        """Drop buffered audio, e.g. stale frames captured while not listening"""
+        self.ring.clear()
+        self.vad.reset()
+
+    def next_utterance(self, timeout: Optional[float] = None,
+                       phrase_time_limit: Optional[float] = None,
+                       on_partial: Optional[Callable[[sr.AudioData], None]] = None,
+                       partial_interval: float = 0.5) -> Utterance:
+        """Run frames through the VAD until a speech segment closes
+
+        While speech is in progress, on_partial receives the audio so far
+        every partial_interval seconds (e.g. to decode a partial transcript).
+        """
+        vad = self.vad
+        if phrase_time_limit:
+            vad.max_utterance_frames = max(1, int(phrase_time_limit / self.seconds_per_frame))
+        partial_frames = max(1, int(partial_interval / self.seconds_per_frame))
+        waited = 0.0
+        while True:
+            item = self.ring.pop(timeout=1.0)
+            if item is None:
+                if self.ring.closed:
+                    # Flush speech cut off by the end of the stream
+                    utterance = vad.finish(time.perf_counter())
+                    if utterance is not None:
+                        return utterance
+                    raise EndOfStream("audio stream ended while waiting for phrase to start")
+                waited += 1.0
+            else:
+                utterance = vad.process(*item)
+                if utterance is not None:
+                    return utterance
+                if not vad.speaking:
+                    waited += self.seconds_per_frame
+                elif on_partial is not None and len(vad.frames) % partial_frames == 0:
+                    on_partial(sr.AudioData(b"".join(vad.frames), self.sample_rate, self.sample_width))
+            if timeout and waited > timeout and not vad.speaking:
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+
+    def listen(self, timeout: Optional[float] = None,
+               phrase_time_limit: Optional[float] = None) -> sr.AudioData:
+        """Segment the next utterance and return its audio"""
+        return self.next_utterance(timeout, phrase_time_limit).audio
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark for SimpleMCP dispatch: calls per second before and after
+compiling tools and resources at registration time.
+
+    python benchmarks/bench_dispatch.py [--calls N]
+"""
+import argparse
+import inspect
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LEAVE_DB", ":memory:")
+
+from server import mcp
+
+
+# The original per-call reflection path, kept here as the "before" baseline
+def legacy_execute_tool(server, tool_name, **kwargs):
+    if tool_name in server.tools:
+        tool_func = server.tools[tool_name]
+        sig = inspect.signature(tool_func)
+        params = {}
+        for param_name, param in sig.parameters.items():
+            if param_name in kwargs:
+                params[param_name] = kwargs[param_name]
+        return tool_func(**params)
+    return f"Tool '{tool_name}' not found."
+
+def legacy_execute_resource(server, resource_pattern, **kwargs):
+    for pattern, func in server.resources.items():
+        if pattern.split('://')[0] == resource_pattern:
+            sig = inspect.signature(func)
+            params = {}
+            for param_name, param in sig.parameters.items():
+                if param_name in kwargs:
+                    params[param_name] = kwargs[param_name]
+            return func(**params)
+    return f"Resource '{resource_pattern}' not found."
+
+def measure(label, func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    elapsed = time.perf_counter() - start
+    rate = calls / elapsed
+    print(f"{label:<28} {rate:>12,.0f} calls/s")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    cases = [
+        ("tool get_leave_balance",
+         lambda: legacy_execute_tool(mcp, "get_leave_balance", employee_id="E001"),
+         lambda: mcp.execute_tool("get_leave_balance", employee_id="E001")),
+        ("resource greeting",
+         lambda: legacy_execute_resource(mcp, "greeting", name="Sam"),
+         lambda: mcp.execute_resource("greeting", name="Sam")),
+    ]
+    for name, before, after in cases:
+        print(name)
+        old = measure("  before (reflection)", before, args.calls)
+        new = measure("  after (compiled)", after, args.calls)
+        print(f"  speedup: {new / old:.2f}x")
+
+if __name__ == "__main__":
+    main()
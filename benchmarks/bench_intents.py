@@ -0,0 +1,107 @@
+"""
+Throughput benchmark for intent routing: the original if/elif substring chain
+versus the compiled single-pass IntentEngine, over a corpus of utterances.
+
+    python benchmarks/bench_intents.py [--repeat N]
+
+Only routing (intent + employee id + dates) is timed, so tool side effects
+such as apply_leave do not skew the comparison. The legacy chain scans every
+employee id per branch, so the comparison is repeated as the directory grows.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LEAVE_DB", ":memory:")
+
+from server import load_employees, router, store
+
+TEMPLATES = [
+    "check balance for {emp}",
+    "what is the balance for e zero zero one",
+    "how many days does {emp} have left",
+    "get leave history for {emp}",
+    "show me the history of {emp}",
+    "apply leave for {emp} on 2025-04-17 and 2025-05-01",
+    "please apply for leave for {emp} on 2025-06-02",
+    "hello my name is sam",
+    "hi there",
+    "help",
+    "what is the weather like this afternoon",
+]
+
+# Employee ids the legacy chain scans, mirroring the old employee_ids
+employee_ids = store.employee_ids()
+
+def build_corpus(size: int):
+    rng = random.Random(42)
+    ids = list(employee_ids) + ["E999"]
+    return [rng.choice(TEMPLATES).format(emp=rng.choice(ids)) for _ in range(size)]
+
+# The original routing chain from process_voice_command, kept as the baseline
+def legacy_route(command):
+    command = command.lower()
+    if "balance" in command or "how many days" in command:
+        for emp_id in employee_ids:
+            if emp_id.lower() in command:
+                return "check_balance", emp_id
+        return "check_balance", None
+    elif "history" in command:
+        for emp_id in employee_ids:
+            if emp_id.lower() in command:
+                return "leave_history", emp_id
+        return "leave_history", None
+    elif "apply" in command and "leave" in command:
+        emp_id = None
+        for e_id in employee_ids:
+            if e_id.lower() in command:
+                emp_id = e_id
+                break
+        dates = re.findall(r'\d{4}-\d{2}-\d{2}', command)
+        return "apply_leave", (emp_id, dates)
+    elif "hello" in command or "hi" in command:
+        return "greeting", None
+    elif "help" in command:
+        return "help", None
+    return None, None
+
+def measure(label, func, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for utterance in corpus:
+            func(utterance)
+    elapsed = time.perf_counter() - start
+    rate = len(corpus) * repeat / elapsed
+    print(f"{label:<24} {rate:>12,.0f} utterances/s")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent routing throughput")
+    parser.add_argument("--corpus", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--employees", type=int, nargs="+", default=[2, 100, 1000, 10_000],
+                        help="directory sizes to compare at")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.corpus)
+    router.compile()
+    changed = sum(1 for u in corpus
+                  if legacy_route(u)[0] != (router.parse(u)[0].name if router.parse(u)[0] else None))
+    print(f"utterances routed differently (e.g. 'this afternoon' no longer greets): {changed} of {len(corpus)}")
+
+    for size in args.employees:
+        # Pad the directory with synthetic employees after the real ones
+        extra = [f"X{n:06d}" for n in range(len(employee_ids), size)]
+        load_employees((emp_id, 20, []) for emp_id in extra)
+        employee_ids.extend(extra)
+        print(f"\n{len(employee_ids)} employees")
+        old = measure("  legacy if/elif chain", legacy_route, corpus, args.repeat)
+        new = measure("  compiled IntentEngine", router.parse, corpus, args.repeat)
+        print(f"  ratio: {new / old:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Headless end-to-end benchmark: no GUI, microphone or network.
+
+    python benchmarks/bench_pipeline.py [--wav a.wav ...] [--corpus utterances.txt] [--output report.json]
+
+Three stages are measured:
+
+* audio: WAV files are replayed through sr.AudioFile into voice_recognizer
+  with the offline "stub" recognizer (canned transcripts, optional decode
+  delay), through VAD segmentation, the recognizer pool, routing and tools.
+  Without --wav a synthetic recording of tone bursts is generated.
+* process_voice_command: a text corpus is routed one command at a time.
+* execute_tool: direct tool calls (balance, history, apply) over the directory.
+
+The report is JSON: throughput, p50/p95/p99 latency and peak RSS per stage,
+plus the per-stage latency histograms from metrics.py and the git commit, so
+runs can be compared across commits.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LEAVE_DB", ":memory:")
+os.environ["VOICE_MCP_METRICS"] = "1"
+
+import speech_recognition as sr
+
+from metrics import metrics
+from server import load_employees, mcp, message_queue, process_voice_command, store, voice_recognizer
+from transcript import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEMPLATES = [
+    "check balance for {emp}",
+    "how many days does {emp} have left",
+    "get leave history for {emp}",
+    "apply leave for {emp} on {day}",
+    "hello my name is sam",
+    "help",
+    "what is the weather like this afternoon",
+]
+
+def rss_kb() -> int:
+    """Current resident set size in KiB (Linux /proc only)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+class PeakRss:
+    """Samples this process's RSS in the background while a stage runs"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self.done = threading.Event()
+
+    def sample(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, rss_kb())
+
+    def __enter__(self):
+        self.peak = rss_kb()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.done.set()
+        self.thread.join()
+        self.peak = max(self.peak, rss_kb())
+        return False
+
+class Recorder:
+    """Stands in for a TranscriptWriter on message_queue to timestamp every message"""
+
+    def __init__(self):
+        self.entries = []
+
+    def record(self, message):
+        self.entries.append((time.perf_counter(), message))
+
+def summarize(latencies, elapsed, peak_kb):
+    return {
+        "count": len(latencies),
+        "throughput_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_rss_kb": peak_kb,
+    }
+
+def synth_wav(path: str, utterances: int = 8, sample_rate: int = 16000):
+    """Write a recording of tone bursts separated by silence, one burst per utterance"""
+    rng = random.Random(7)
+    frames = bytearray()
+
+    def silence(seconds):
+        for _ in range(int(seconds * sample_rate)):
+            frames.extend(struct.pack("<h", int(rng.gauss(0, 30))))
+
+    silence(1.0)
+    for index in range(utterances):
+        # Different lengths give the stub recognizer different transcripts
+        duration = 0.6 + 0.1 * (index % 5)
+        pitch = 220 + 40 * index
+        for n in range(int(duration * sample_rate)):
+            frames.extend(struct.pack("<h", int(8000 * math.sin(2 * math.pi * pitch * n / sample_rate))))
+        silence(1.0)
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(bytes(frames))
+
+def bench_audio(paths, corpus, workers, decode_delay, repeat):
+    """Replay WAV files through voice_recognizer and time each utterance to its response"""
+    latencies = []
+    elapsed = 0.0
+    with PeakRss() as peak:
+        for _ in range(repeat):
+            for path in paths:
+                stop_event, active = threading.Event(), threading.Event()
+                active.set()
+                recorder = Recorder()
+                message_queue.transcript = recorder
+                start = time.perf_counter()
+                voice_recognizer(stop_event, active, source_factory=lambda path=path: sr.AudioFile(path),
+                                 backend="stub", workers=workers,
+                                 backend_options={"transcripts": corpus, "delay": decode_delay})
+                elapsed += time.perf_counter() - start
+                message_queue.transcript = None
+                message_queue.drain()
+                # Pair each segmented utterance with its response, in order
+                segmented, answered = [], []
+                for queued_at, message in recorder.entries:
+                    if message.get("content") == "Processing speech...":
+                        segmented.append(queued_at)
+                    elif message["source"] == "mcp":
+                        answered.append(queued_at)
+                latencies.extend(done - began for began, done in zip(segmented, answered))
+    report = summarize(latencies, elapsed, peak.peak)
+    report["recognizer_workers_peak_rss_kb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return report
+
+def bench_commands(corpus):
+    latencies = []
+    with PeakRss() as peak:
+        start = time.perf_counter()
+        for utterance in corpus:
+            began = time.perf_counter()
+            process_voice_command(utterance).result()
+            latencies.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed, peak.peak)
+
+def bench_tools(calls):
+    latencies = []
+    with PeakRss() as peak:
+        start = time.perf_counter()
+        for name, arguments in calls:
+            began = time.perf_counter()
+            mcp.execute_tool(name, **arguments)
+            latencies.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed, peak.peak)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless pipeline benchmark")
+    parser.add_argument("--wav", nargs="*", default=[], help="recordings to replay (default: synthetic)")
+    parser.add_argument("--corpus", help="text file with one utterance per line (default: generated)")
+    parser.add_argument("--commands", type=int, default=5000, help="generated corpus size")
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=2, help="recognizer worker processes")
+    parser.add_argument("--decode-delay", type=float, default=0.0, help="simulated seconds per decode")
+    parser.add_argument("--audio-repeat", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    load_employees((f"X{n:06d}", 10_000, []) for n in range(args.employees))
+    employees = store.employee_ids()
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    else:
+        corpus = [
+            rng.choice(TEMPLATES).format(emp=rng.choice(employees),
+                                         day=f"2031-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+            for _ in range(args.commands)
+        ]
+    calls = []
+    for n in range(args.commands):
+        emp = rng.choice(employees)
+        kind = n % 3
+        if kind == 0:
+            calls.append(("get_leave_balance", {"employee_id": emp}))
+        elif kind == 1:
+            calls.append(("get_leave_history", {"employee_id": emp}))
+        else:
+            calls.append(("apply_leave", {"employee_id": emp, "leave_dates": [f"2032-01-{n % 28 + 1:02d}"]}))
+
+    wavs = args.wav
+    temp = None
+    if not wavs:
+        temp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+        temp.close()
+        synth_wav(temp.name)
+        wavs = [temp.name]
+
+    try:
+        report = {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "employees": len(employees),
+            "stages": {
+                "audio": bench_audio(wavs, corpus[:50], args.workers, args.decode_delay, args.audio_repeat),
+                "process_voice_command": bench_commands(corpus),
+                "execute_tool": bench_tools(calls),
+            },
+            "spans": metrics.snapshot(),
+            "cache": mcp.cache.stats(),
+            "coalesced_calls": mcp.coalesced,
+            "message_bus": message_queue.stats(),
+        }
+    finally:
+        if temp is not None:
+            os.unlink(temp.name)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Cold-start benchmark for the headless MCP server.
+
+    python benchmarks/bench_startup.py [--runs 10]
+
+Each run starts a fresh interpreter, so nothing is cached in-process:
+
+* import: time to `import server`, and whether speech_recognition, tkinter
+  or the audio modules were loaded (a headless import must load none).
+* first_tool_call: time from spawning `server.py --headless` on stdio to the
+  response of its first tools/call.
+
+Results (median and worst of the runs, in ms) are printed as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("speech_recognition", "tkinter", "audio", "recognizers", "http.server")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import server
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def environment():
+    env = dict(os.environ)
+    env["LEAVE_DB"] = ":memory:"
+    return env
+
+def time_import():
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=environment(),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def time_first_tool_call():
+    requests = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/call",
+         "params": {"name": "get_leave_balance", "arguments": {"employee_id": "E001"}}},
+    ]
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server.py"), "--headless", "--transport", "stdio"],
+        cwd=ROOT, env=environment(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, text=True
+    )
+    try:
+        process.stdin.write("".join(json.dumps(r) + "\n" for r in requests))
+        process.stdin.flush()
+        while True:
+            line = process.stdout.readline()
+            if not line:
+                raise RuntimeError("server exited before answering")
+            if json.loads(line).get("id") == 2:
+                return (time.perf_counter() - start) * 1000
+    finally:
+        process.stdin.close()
+        process.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless server cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    imports = [time_import() for _ in range(args.runs)]
+    calls = [time_first_tool_call() for _ in range(args.runs)]
+    import_ms = [run["ms"] for run in imports]
+    report = {
+        "runs": args.runs,
+        "import_ms": {"median": round(statistics.median(import_ms), 1), "max": round(max(import_ms), 1)},
+        "heavy_modules_loaded": sorted({m for run in imports for m in run["loaded"]}),
+        "first_tool_call_ms": {"median": round(statistics.median(calls), 1), "max": round(max(calls), 1)},
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
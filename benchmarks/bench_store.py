@@ -0,0 +1,76 @@
+"""
+apply_leave throughput on the SQLite leave store under thread contention.
+
+    python benchmarks/bench_store.py [--ops 4000] [--threads 1 4 8 16]
+
+Each run uses a fresh on-disk database in a temporary directory. Threads
+apply one-day leaves to a small set of hot employees so they contend on the
+same rows; afterwards the balances are checked against the number of
+successful applications to confirm no update was lost.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import InsufficientBalance, LeaveStore
+
+FIRST_DAY = date(2025, 1, 1).toordinal()
+
+def run(path, threads, ops, employees, synchronous):
+    store = LeaveStore(path, pool_size=threads, synchronous=synchronous)
+    ids = [f"E{n:05d}" for n in range(employees)]
+    store.bulk_load((emp_id, ops, []) for emp_id in ids)
+    applied = [0] * threads
+    rejected = [0] * threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        barrier.wait()
+        for n in range(ops // threads):
+            # Distinct days per thread, so requests never collide as duplicates
+            day = date.fromordinal(FIRST_DAY + index * ops + n).isoformat()
+            try:
+                store.apply_leave(rng.choice(ids), [day])
+                applied[index] += 1
+            except InsufficientBalance:
+                rejected[index] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    deducted = sum(ops - store.get_balance(emp_id) for emp_id in ids)
+    consistent = deducted == sum(applied)
+    store.close()
+    return sum(applied) / elapsed, consistent
+
+def main():
+    parser = argparse.ArgumentParser(description="apply_leave ops/sec under contention")
+    parser.add_argument("--ops", type=int, default=4000, help="total apply_leave calls per run")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--employees", type=int, default=8, help="hot employees shared by all threads")
+    parser.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL"])
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'ops/s':>12}  consistent")
+    for threads in args.threads:
+        with tempfile.TemporaryDirectory() as tmp:
+            rate, consistent = run(os.path.join(tmp, "leaves.db"), threads, args.ops,
+                                   args.employees, args.synchronous)
+        print(f"{threads:>8} {rate:>12,.0f}  {consistent}")
+
+if __name__ == "__main__":
+    main()
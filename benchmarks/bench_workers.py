@@ -0,0 +1,156 @@
+"""
+Scaling benchmark: tool calls per second versus worker processes.
+
+    python benchmarks/bench_workers.py [--workers 0 1 2 4] [--clients 8] [--duration 5]
+
+For each worker count a fresh `server.py --headless --transport tcp` is
+started on a copy of the same database (0 means the single-process server,
+N > 0 adds `--workers N`). Client processes then keep `--depth` requests
+pipelined on their own connection for `--duration` seconds, with a mix of
+get_leave_balance, get_leave_history and apply_leave over random employees.
+
+The report is JSON: calls/sec, speedup over the single-process server and
+the per-call error count for each worker count, plus the host's CPU count
+(speedup is bounded by the cores the workers and clients share).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from store import LeaveStore
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+def build_database(path: str, employees: int):
+    store = LeaveStore(path)
+    store.bulk_load((f"X{n:06d}", 1_000_000, []) for n in range(employees))
+    store.close()
+
+def start_server(database: str, workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["LEAVE_DB"] = database
+    command = [sys.executable, os.path.join(ROOT, "server.py"), "--headless",
+               "--transport", "tcp", "--port", str(port)]
+    if workers:
+        command += ["--workers", str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start listening")
+
+def request(request_id: int, rng: random.Random, employees: int, client: int) -> bytes:
+    emp = f"X{rng.randrange(employees):06d}"
+    kind = request_id % 3
+    if kind == 0:
+        name, arguments = "get_leave_balance", {"employee_id": emp}
+    elif kind == 1:
+        name, arguments = "get_leave_history", {"employee_id": emp}
+    else:
+        # Unique per client and request, so leaves are not rejected as duplicates
+        day = date.fromordinal(740_000 + client * 100_000 + request_id).isoformat()
+        name, arguments = "apply_leave", {"employee_id": emp, "leave_dates": [day]}
+    message = {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+               "params": {"name": name, "arguments": arguments}}
+    return json.dumps(message).encode() + b"\n"
+
+def run_client(args):
+    """One client connection keeping depth requests in flight until the deadline"""
+    port, client, employees, depth, duration = args
+    rng = random.Random(client)
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        stream = sock.makefile("rwb")
+        sent = completed = errors = 0
+        for _ in range(depth):
+            stream.write(request(sent, rng, employees, client))
+            sent += 1
+        stream.flush()
+        deadline = time.perf_counter() + duration
+        while completed < sent:
+            response = json.loads(stream.readline())
+            completed += 1
+            if "error" in response or response["result"].get("isError"):
+                errors += 1
+            if time.perf_counter() < deadline:
+                stream.write(request(sent, rng, employees, client))
+                stream.flush()
+                sent += 1
+        return completed, errors
+
+def measure(database: str, workers: int, clients: int, employees: int, depth: int, duration: float):
+    port = free_port()
+    server = start_server(database, workers, port)
+    try:
+        with multiprocessing.Pool(clients) as pool:
+            # A short warm-up run so worker start-up is not measured
+            pool.map(run_client, [(port, c, employees, depth, 0.2) for c in range(clients)])
+            start = time.perf_counter()
+            results = pool.map(run_client, [(port, c + clients, employees, depth, duration)
+                                            for c in range(clients)])
+            elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    calls = sum(completed for completed, _ in results)
+    return {"workers": workers, "calls": calls, "errors": sum(errors for _, errors in results),
+            "calls_per_s": round(calls / elapsed, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Tool calls/sec versus worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="client processes, one connection each")
+    parser.add_argument("--depth", type=int, default=16, help="pipelined requests per connection")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per worker count")
+    parser.add_argument("--employees", type=int, default=10_000)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench-workers-")
+    try:
+        template = os.path.join(scratch, "template.db")
+        build_database(template, args.employees)
+        runs = []
+        for workers in args.workers:
+            # Each run starts from the same data; worker mode splits its own copy into shards
+            run_dir = os.path.join(scratch, f"workers-{workers}")
+            os.mkdir(run_dir)
+            database = os.path.join(run_dir, "leaves.db")
+            shutil.copy(template, database)
+            runs.append(measure(database, workers, args.clients, args.employees, args.depth, args.duration))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    baseline = runs[0]["calls_per_s"] or 1.0
+    for run in runs:
+        run["speedup"] = round(run["calls_per_s"] / baseline, 2)
+    report = {"cpus": os.cpu_count(), "clients": args.clients, "depth": args.depth,
+              "duration_s": args.duration, "employees": args.employees, "runs": runs}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Load test for the WebSocket gateway: drives many simulated client.py
+connections and reports round-trip latency and gateway memory per connection.
+
+    python benchmarks/load_gateway.py [--clients 300] [--messages 20]
+
+The gateway is started as a subprocess (without the microphone thread) so
+its resident memory can be measured separately from the simulated clients.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def rss_kb(pid: int) -> int:
+    """Resident set size of a process in KiB (Linux /proc only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def wait_for_gateway(url, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with websockets.connect(url):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+async def simulated_client(url, messages, connected, start, latencies):
+    async with websockets.connect(url, max_queue=None) as websocket:
+        connected.release()
+        await start.wait()
+        for _ in range(messages):
+            request_id = uuid.uuid4().hex
+            sent = time.perf_counter()
+            await websocket.send(json.dumps({
+                "type": "message",
+                "id": request_id,
+                "content": "check balance for E001",
+            }))
+            # Every client sees every broadcast; wait for the reply to this request
+            while True:
+                frame = json.loads(await websocket.recv())
+                if frame.get("reply_to") == request_id:
+                    latencies.append(time.perf_counter() - sent)
+                    break
+
+async def run(args):
+    url = f"ws://127.0.0.1:{args.port}"
+    gateway = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "gateway.py"), "--host", "127.0.0.1",
+         "--port", str(args.port), "--no-voice"],
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        await wait_for_gateway(url)
+        await asyncio.sleep(0.5)
+        baseline = rss_kb(gateway.pid)
+
+        connected = asyncio.Semaphore(0)
+        start = asyncio.Event()
+        latencies = []
+        tasks = [asyncio.create_task(simulated_client(url, args.messages, connected, start, latencies))
+                 for _ in range(args.clients)]
+        for _ in range(args.clients):
+            await connected.acquire()
+        await asyncio.sleep(0.5)
+        loaded = rss_kb(gateway.pid)
+
+        began = time.perf_counter()
+        start.set()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - began
+
+        report = {
+            "clients": args.clients,
+            "messages": len(latencies),
+            "throughput_msgs_per_s": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "gateway_rss_baseline_kb": baseline,
+            "gateway_rss_per_connection_kb": round((loaded - baseline) / args.clients, 1),
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        gateway.terminate()
+        gateway.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for gateway.py")
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=20, help="messages sent per client")
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
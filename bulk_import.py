@@ -0,0 +1,74 @@
+"""
+Streaming JSONL import of tool calls, e.g. the nightly HR leave export.
+
+Each line is either a tool call {"name": "apply_leave", "arguments": {...}}
+or bare apply_leave arguments {"employee_id": "E001", "leave_dates": [...]}.
+Lines are read lazily and dispatched through SimpleMCP.execute_batch in
+fixed-size batches, so memory stays bounded by the batch size however large
+the file is. One result line per input line is written as JSONL.
+
+    python bulk_import.py leaves.jsonl [--batch-size 1000] [--output results.jsonl]
+"""
+import argparse
+import json
+import sys
+import time
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, Optional, Tuple
+
+def read_calls(lines: Iterable[str]) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (line number, tool call, error) for each non-blank line"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Error: invalid JSON: {e}"
+            continue
+        if isinstance(record, dict) and "name" in record:
+            yield number, record, None
+        elif isinstance(record, dict) and "employee_id" in record and "leave_dates" in record:
+            yield number, {"name": "apply_leave", "arguments": record}, None
+        else:
+            yield number, None, "Error: line is not a tool call or an apply_leave record"
+
+def import_jsonl(mcp, lines: Iterable[str], output: IO[str], batch_size: int = 1000) -> Dict[str, int]:
+    """Stream lines through mcp.execute_batch; returns line counts"""
+    counts = {"lines": 0, "dispatched": 0, "rejected": 0}
+    calls = read_calls(lines)
+    while True:
+        batch = list(islice(calls, batch_size))
+        if not batch:
+            break
+        valid = [call for _, call, error in batch if error is None]
+        results = iter(mcp.execute_batch(valid))
+        for number, call, error in batch:
+            result = error if error is not None else next(results)
+            output.write(json.dumps({"line": number, "result": result}) + "\n")
+            counts["lines"] += 1
+            counts["dispatched" if error is None else "rejected"] += 1
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream JSONL tool calls into the leave manager")
+    parser.add_argument("path", help="JSONL file, or - for stdin")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output", help="write per-line results here instead of stdout")
+    args = parser.parse_args()
+
+    from server import mcp
+
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        counts = import_jsonl(mcp, source, output, args.batch_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print(f"{counts['lines']} lines ({counts['dispatched']} dispatched, {counts['rejected']} rejected) "
+          f"in {elapsed:.2f}s", file=sys.stderr)
@@ -0,0 +1,166 @@
+"""
+Bounded message bus between the voice thread, the text path and the UI.
+
+Messages are compact __slots__ records rather than ad-hoc dicts. The bus
+holds at most `maxsize` of them, and what happens when a stalled consumer
+lets it fill up is an explicit policy:
+
+* "block": producers wait for room (backpressure).
+* "drop_oldest": the oldest pending message is discarded.
+* "coalesce": a status event ("Listening...", "Processing speech...")
+  replaces a status event still waiting at the tail, and when the bus is
+  full the oldest pending status event makes room. Producers only wait
+  when the bus is full of real content.
+
+The consumer's own thread never blocks on a full bus (it would wait for
+itself); its messages evict the oldest one instead. The consumer is woken
+through `notifier` once per burst, and every posted message can be
+recorded by an optional transcript.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import metrics
+
+POLICIES = ("block", "drop_oldest", "coalesce")
+
+class Message:
+    """One bus event; reads like the dicts it replaced (message["source"], message.get("timing"))"""
+    __slots__ = ("source", "content", "status", "timing", "queued_at")
+    FIELDS = ("source", "content", "timing")
+
+    def __init__(self, source: str, content: Any, status: bool = False,
+                 timing: Optional[Dict[str, float]] = None):
+        self.source = source  # "user", "mcp" or "system"
+        self.content = content
+        self.status = status  # Transient progress note that a newer one supersedes
+        self.timing = timing
+        self.queued_at = 0.0
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None) if key in self.FIELDS else None
+        return default if value is None else value
+
+    def keys(self):
+        return [key for key in self.FIELDS if getattr(self, key) is not None]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in self.keys()}
+
+    def __repr__(self):
+        return f"Message({self.source!r}, {self.content!r})"
+
+class MessageBus:
+    """Bounded multi-producer, single-consumer queue of Message records"""
+
+    def __init__(self, maxsize: int = 1000, policy: str = "coalesce"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}'. Available: {', '.join(POLICIES)}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.messages: deque = deque()
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.not_empty = threading.Condition(self.lock)
+        self.notifier: Optional[Callable[[], None]] = None
+        self.signalled = False
+        self.consumer: Optional[int] = None
+        # Optional TranscriptWriter that records every message posted
+        self.transcript = None
+        self.high_water = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.blocked = 0
+
+    def put(self, message: Message, timeout: Optional[float] = None):
+        """Post a message, applying the overflow policy; raises queue.Full if a blocking put times out"""
+        transcript = self.transcript
+        if transcript is not None:
+            transcript.record(message)
+        if metrics.enabled:
+            message.queued_at = time.perf_counter()
+        with self.lock:
+            messages = self.messages
+            if self.policy == "coalesce" and message.status and messages and messages[-1].status:
+                messages[-1] = message
+                self.coalesced += 1
+                return
+            if len(messages) >= self.maxsize:
+                self._make_room(timeout)
+            messages.append(message)
+            if len(messages) > self.high_water:
+                self.high_water = len(messages)
+            self.not_empty.notify()
+            notifier = self.notifier
+            if notifier is None or self.signalled:
+                return
+            self.signalled = True
+        try:
+            notifier()
+        except Exception:
+            # The consumer is not listening (e.g. the window closed); re-arm so a later
+            # put can wake it again instead of waiting for a drain that never comes
+            with self.lock:
+                self.signalled = False
+
+    def _make_room(self, timeout: Optional[float]):
+        """Called with the lock held and the bus full"""
+        messages = self.messages
+        if self.policy == "coalesce":
+            for index, pending in enumerate(messages):
+                if pending.status:
+                    del messages[index]
+                    self.coalesced += 1
+                    return
+        if self.policy == "drop_oldest" or threading.get_ident() == self.consumer:
+            messages.popleft()
+            self.dropped += 1
+            return
+        self.blocked += 1
+        if not self.not_full.wait_for(lambda: len(messages) < self.maxsize, timeout):
+            raise queue.Full
+
+    def _take(self) -> Message:
+        message = self.messages.popleft()
+        self.not_full.notify()
+        if message.queued_at:
+            metrics.observe("queue_wait", time.perf_counter() - message.queued_at)
+        return message
+
+    def get(self, timeout: Optional[float] = None) -> Message:
+        """Next message; raises queue.Empty if none arrives within timeout"""
+        with self.lock:
+            self.consumer = threading.get_ident()
+            if not self.not_empty.wait_for(lambda: self.messages, timeout):
+                raise queue.Empty
+            return self._take()
+
+    def drain(self) -> List[Message]:
+        """Take everything queued and re-arm the notifier"""
+        with self.lock:
+            self.consumer = threading.get_ident()
+            self.signalled = False
+            return [self._take() for _ in range(len(self.messages))]
+
+    def qsize(self) -> int:
+        return len(self.messages)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "queued": len(self.messages),
+                "maxsize": self.maxsize,
+                "policy": self.policy,
+                "high_water": self.high_water,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "blocked": self.blocked,
+            }
@@ -0,0 +1,131 @@
+"""
+Result cache for read-only SimpleMCP tools and resources.
+
+Entries are evicted least-recently-used when either the entry count or the
+approximate memory cap is exceeded, and expire after a TTL. Each entry
+carries a tag (e.g. the employee id it was computed for) so a write can
+evict exactly the entries it affects. A per-tag generation counter stops a
+read that raced with a write from caching its stale result.
+
+Writes made by another process never call invalidate(); an optional
+`changed` check (e.g. LeaveStore.changed_elsewhere) is polled before each
+read and clears the whole cache when it reports such a write.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+MISSING = object()
+
+def freeze(value: Any) -> Hashable:
+    """Turn tool arguments (which may contain lists and dicts) into a hashable key"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+class ResultCache:
+    """Thread-safe LRU/TTL cache with tag-based invalidation and hit/miss counters"""
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 4 * 1024 * 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # key -> (value, expires_at, size, tag)
+        self.entries: "OrderedDict[Hashable, Tuple[Any, float, int, Hashable]]" = OrderedDict()
+        self.tags: Dict[Hashable, set] = {}
+        self.generations: Dict[Hashable, int] = {}
+        # Bumped by clear(), so reads in flight for any tag are not cached afterwards
+        self.epoch = 0
+        # Optional check for writes made outside this process; True clears the cache
+        self.changed: Optional[Callable[[], bool]] = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.external_clears = 0
+
+    def generation(self, tag: Hashable) -> Tuple[int, int]:
+        """Version of tag's entries, read before computing a value to put(); polls `changed`"""
+        changed = self.changed
+        if changed is not None and changed():
+            self.clear()
+            with self.lock:
+                self.external_clears += 1
+        return self.epoch, self.generations.get(tag, 0)
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value, or MISSING"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            if entry[1] < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, tag: Hashable = None, generation: Optional[Tuple[int, int]] = None,
+            ttl: Optional[float] = None):
+        """Store a value unless its tag was invalidated since generation was read"""
+        size = sys.getsizeof(value) + sys.getsizeof(key)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if generation is not None and (self.epoch, self.generations.get(tag, 0)) != generation:
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), size, tag)
+            self.tags.setdefault(tag, set()).add(key)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, tag: Hashable):
+        """Evict every entry computed for tag"""
+        with self.lock:
+            self.generations[tag] = self.generations.get(tag, 0) + 1
+            for key in list(self.tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.epoch += 1
+            self.entries.clear()
+            self.tags.clear()
+            self.bytes = 0
+
+    def _remove(self, key: Hashable):
+        value, expires_at, size, tag = self.entries.pop(key)
+        self.bytes -= size
+        keys = self.tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.tags[tag]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "external_clears": self.external_clears,
+            }
@@ -4,15 +4,31 @@ import asyncio
 import websockets
 import threading
 from datetime import datetime
+import random
 import time
+import uuid
+
+from conversation import ConversationView
+
+SERVER_URL = "ws://localhost:8765"
+
+# Reconnect backoff in seconds, and the most frames sent in one batch
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+MAX_BATCH = 64
 
 class ClaudeDesktopClient:
-    def __init__(self, root):
+    def __init__(self, root, retention=500):
         self.root = root
         self.root.title("Claude Desktop with Voice Control")
         self.root.geometry("800x600")
         self.websocket = None
         self.connected = False
+        self.loop = None
+        self.outbound = None
+        self.loop_ready = threading.Event()
+        # Correlation id -> send time, for round-trip measurement
+        self.pending = {}
         
         # Configure the main window
         self.root.configure(bg="#f0f0f0")
@@ -28,9 +44,19 @@ class ClaudeDesktopClient:
         # Add a scrollbar
         scrollbar = tk.Scrollbar(self.chat_display)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.chat_display.config(yscrollcommand=scrollbar.set)
         scrollbar.config(command=self.chat_display.yview)
         
+        # Bounded view over the chat; older messages page in from disk on scroll-back
+        self.view = ConversationView(
+            self.chat_display, self.render_message,
+            tags={
+                "user": {"foreground": "#2196F3", "font": ("Arial", 10, "bold")},
+                "assistant": {"foreground": "#4CAF50", "font": ("Arial", 10, "bold")},
+                "time": {"foreground": "#9E9E9E", "font": ("Arial", 8)},
+            },
+            scrollbar=scrollbar, retention=retention
+        )
+        
         # Create the input area
         self.input_frame = tk.Frame(root, bg="#f0f0f0")
         self.input_frame.pack(fill=tk.X, padx=20, pady=10)
@@ -66,31 +92,61 @@ class ClaudeDesktopClient:
         self.connect_thread.start()
     
     def start_connection(self):
-        """Start the WebSocket connection in a separate thread"""
-        asyncio.run(self.connect_websocket())
+        """Run the single long-lived client event loop in this thread"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.outbound = asyncio.Queue()
+        self.loop_ready.set()
+        self.loop.run_until_complete(self.connect_websocket())
     
     async def connect_websocket(self):
-        """Connect to the WebSocket server"""
+        """Connect to the WebSocket server, reconnecting with jittered backoff"""
+        attempt = 0
         while True:
             try:
                 self.update_connection_status("Connecting...", "#FFA000")
-                async with websockets.connect("ws://localhost:8765") as websocket:
+                async with websockets.connect(SERVER_URL) as websocket:
                     self.websocket = websocket
                     self.connected = True
+                    attempt = 0
                     self.update_connection_status("Connected", "#4CAF50")
                     
-                    # Listen for messages from the server
-                    while True:
-                        message = await websocket.recv()
-                        self.handle_server_message(message)
+                    # Outbound frames are written by one task for this connection
+                    sender = asyncio.create_task(self.send_outbound(websocket))
+                    try:
+                        # Listen for messages from the server
+                        while True:
+                            message = await websocket.recv()
+                            self.handle_server_message(message)
+                    finally:
+                        sender.cancel()
                         
-            except (websockets.exceptions.ConnectionClosed, 
-                   websockets.exceptions.InvalidStatusCode,
-                   ConnectionRefusedError) as e:
+            except (websockets.exceptions.WebSocketException, OSError) as e:
                 self.connected = False
+                self.websocket = None
+                self.pending.clear()
                 self.update_connection_status(f"Disconnected: {str(e)}", "#D32F2F")
-                # Wait before trying to reconnect
-                await asyncio.sleep(5)
+                # Full-jitter exponential backoff before reconnecting
+                delay = random.uniform(0, min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** attempt))
+                attempt += 1
+                await asyncio.sleep(delay)
+    
+    async def send_outbound(self, websocket):
+        """Drain the outbound queue, batching frames that arrive in a burst"""
+        while True:
+            batch = [await self.outbound.get()]
+            while not self.outbound.empty() and len(batch) < MAX_BATCH:
+                batch.append(self.outbound.get_nowait())
+            try:
+                payload = batch[0] if len(batch) == 1 else batch
+                await websocket.send(json.dumps(payload))
+            except Exception as e:
+                print(f"Error sending message: {e}")
+    
+    def enqueue(self, frame):
+        """Hand a frame to the client loop from the Tk thread"""
+        self.loop_ready.wait()
+        asyncio.run_coroutine_threadsafe(self.outbound.put(frame), self.loop)
     
     def update_connection_status(self, text, color):
         """Update the connection status text and color"""
@@ -101,6 +157,12 @@ class ClaudeDesktopClient:
         message = json.loads(message_json)
         
         if message["type"] == "message":
+            # Measure round-trip time for replies to our own requests
+            sent = self.pending.pop(message.get("reply_to"), None)
+            if sent is not None:
+                rtt_ms = (time.perf_counter() - sent) * 1000
+                self.update_connection_status(f"Connected (round trip {rtt_ms:.0f} ms)", "#4CAF50")
+            
             # Display the message
             self.root.after(0, lambda: self.display_message(
                 message["role"], message["content"], message["timestamp"]))
@@ -114,26 +176,23 @@ class ClaudeDesktopClient:
     
     def display_message(self, role, content, timestamp):
         """Display a message in the chat window"""
-        self.chat_display.config(state=tk.NORMAL)
-        
+        self.view.append([{"role": role, "content": content, "timestamp": timestamp}])
+    
+    @staticmethod
+    def render_message(message):
+        """Text segments for a chat message"""
         # Format timestamp
-        dt = datetime.fromisoformat(timestamp)
+        dt = datetime.fromisoformat(message["timestamp"])
         time_str = dt.strftime("%H:%M:%S")
         
         # Set tag for formatting
+        role = message["role"]
         role_tag = "user" if role == "user" else "assistant"
-        self.chat_display.tag_config("user", foreground="#2196F3", font=("Arial", 10, "bold"))
-        self.chat_display.tag_config("assistant", foreground="#4CAF50", font=("Arial", 10, "bold"))
-        self.chat_display.tag_config("time", foreground="#9E9E9E", font=("Arial", 8))
-        
-        # Insert the message
-        self.chat_display.insert(tk.END, f"{role.capitalize()} ", role_tag)
-        self.chat_display.insert(tk.END, f"[{time_str}]:\n", "time")
-        self.chat_display.insert(tk.END, f"{content}\n\n")
-        
-        # Scroll to the bottom
-        self.chat_display.see(tk.END)
-        self.chat_display.config(state=tk.DISABLED)
+        return [
+            (f"{role.capitalize()} ", role_tag),
+            (f"[{time_str}]:\n", "time"),
+            (f"{message['content']}\n\n", ""),
+        ]
     
     def send_message(self, event=None):
         """Send a text message to the server"""
@@ -147,40 +206,34 @@ class ClaudeDesktopClient:
         # Display the message locally
         self.display_message("user", message, datetime.now().isoformat())
         
-        # Send the message to the server
-        if self.websocket and self.connected:
-            asyncio.run(self.send_to_server(message))
+        # Queue the message for the client loop
+        self.send_to_server(message)
     
-    async def send_to_server(self, text_message):
-        """Send a message to the WebSocket server"""
-        try:
-            message = {
-                "type": "message",
-                "content": text_message,
-                "timestamp": datetime.now().isoformat()
-            }
-            await self.websocket.send(json.dumps(message))
-        except Exception as e:
-            print(f"Error sending message: {e}")
+    def send_to_server(self, text_message):
+        """Queue a message for the WebSocket server, tagged with a correlation id"""
+        request_id = uuid.uuid4().hex
+        self.pending[request_id] = time.perf_counter()
+        self.enqueue({
+            "type": "message",
+            "id": request_id,
+            "content": text_message,
+            "timestamp": datetime.now().isoformat()
+        })
     
     def toggle_voice_recognition(self):
         """Toggle voice recognition on/off"""
         if not self.connected:
             return
             
-        asyncio.run(self.send_toggle_command())
+        self.send_toggle_command()
     
-    async def send_toggle_command(self):
-        """Send the toggle voice command to the server"""
-        try:
-            command = {
-                "type": "command",
-                "command": "toggle_listening",
-                "timestamp": datetime.now().isoformat()
-            }
-            await self.websocket.send(json.dumps(command))
-        except Exception as e:
-            print(f"Error sending toggle command: {e}")
+    def send_toggle_command(self):
+        """Queue the toggle voice command for the server"""
+        self.enqueue({
+            "type": "command",
+            "command": "toggle_listening",
+            "timestamp": datetime.now().isoformat()
+        })
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,145 @@
+"""
+Bounded conversation view for the Tk front ends.
+
+A long-running kiosk appends messages for days, so the Text widget only
+keeps the most recent `retention` messages. Every message is also appended
+to an on-disk log, and older messages are paged back in from it when the
+user scrolls to the top. Trimming happens in bulk (one delete per
+`trim_batch` messages) and only while the view follows the newest message,
+so text the user is reading never disappears. Tags are configured once.
+"""
+import json
+import tempfile
+from array import array
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# A rendered message: (text, tag) segments inserted in order
+Segments = List[Tuple[str, str]]
+
+class MessageLog:
+    """Append-only JSON-lines file with an in-memory offset index for random access"""
+
+    def __init__(self, path: Optional[str] = None):
+        # Without a path the log lives in an anonymous temporary file for this session
+        self.file = open(path, "w+b") if path else tempfile.TemporaryFile()
+        self.offsets = array("q")
+
+    def append(self, records: Iterable[Dict[str, Any]]):
+        self.file.seek(0, 2)
+        position = self.file.tell()
+        lines = []
+        for record in records:
+            line = json.dumps(record).encode() + b"\n"
+            self.offsets.append(position)
+            position += len(line)
+            lines.append(line)
+        self.file.write(b"".join(lines))
+
+    def read(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """Records start..stop-1, in order"""
+        if start >= stop:
+            return []
+        self.file.flush()
+        self.file.seek(self.offsets[start])
+        return [json.loads(self.file.readline()) for _ in range(stop - start)]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def close(self):
+        self.file.close()
+
+class ConversationView:
+    """Keeps a Text widget to a bounded window over the full message log"""
+
+    def __init__(self, widget, render: Callable[[Dict[str, Any]], Segments],
+                 tags: Dict[str, Dict[str, Any]], scrollbar=None, retention: int = 500,
+                 trim_batch: Optional[int] = None, page_size: int = 100,
+                 log: Optional[MessageLog] = None):
+        self.widget = widget
+        self.render = render
+        self.scrollbar = scrollbar
+        self.retention = retention
+        self.trim_batch = trim_batch or max(1, retention // 4)
+        self.page_size = page_size
+        self.log = log if log is not None else MessageLog()
+        # Log index of the oldest message in the widget, and each shown message's line count
+        self.first = 0
+        self.line_counts = deque()
+        self.paging = False
+        for tag, options in tags.items():
+            widget.tag_config(tag, **options)
+        if scrollbar is not None:
+            widget.config(yscrollcommand=self.on_scroll)
+
+    @staticmethod
+    def flatten(segments: Segments) -> Tuple[list, int]:
+        """Text.insert arguments for a run of segments, and the lines they add"""
+        args = []
+        lines = 0
+        for text, tag in segments:
+            args.append(text)
+            args.append(tag)
+            lines += text.count("\n")
+        return args, lines
+
+    def append(self, records: List[Dict[str, Any]]):
+        """Log and show a batch of messages with one insert"""
+        if not records:
+            return
+        self.log.append(records)
+        following = self.widget.yview()[1] >= 0.999
+        args = []
+        for record in records:
+            segment_args, lines = self.flatten(self.render(record))
+            args.extend(segment_args)
+            self.line_counts.append(lines)
+        self.widget.config(state="normal")
+        self.widget.insert("end", *args)
+        if following:
+            self.trim()
+            self.widget.see("end")
+        self.widget.config(state="disabled")
+
+    def trim(self):
+        """Drop the oldest messages in bulk once the cap is exceeded by a full batch"""
+        excess = len(self.line_counts) - self.retention
+        if excess < self.trim_batch:
+            return
+        lines = 0
+        for _ in range(excess):
+            lines += self.line_counts.popleft()
+        self.widget.delete("1.0", f"{lines + 1}.0")
+        self.first += excess
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(first) <= 0.0 and self.first > 0 and not self.paging:
+            # Page in after this scroll update has been drawn
+            self.paging = True
+            self.widget.after_idle(self.page_in)
+
+    def page_in(self):
+        """Prepend the previous page of messages from the log, keeping the view in place"""
+        self.paging = False
+        start = max(0, self.first - self.page_size)
+        records = self.log.read(start, self.first)
+        if not records:
+            return
+        args = []
+        counts = []
+        for record in records:
+            segment_args, lines = self.flatten(self.render(record))
+            args.extend(segment_args)
+            counts.append(lines)
+        self.widget.config(state="normal")
+        self.widget.insert("1.0", *args)
+        self.widget.config(state="disabled")
+        self.line_counts.extendleft(reversed(counts))
+        self.first = start
+        # Keep the line that was at the top where it was
+        self.widget.yview(f"{sum(counts) + 1}.0")
+
+    def close(self):
+        self.log.close()
@@ -0,0 +1,218 @@
+"""
+WebSocket gateway on ws://localhost:8765 for client.py.
+
+Clients send {"type": "message", "content": ...} and
+{"type": "command", "command": "toggle_listening"} frames, either singly or
+batched in a JSON array. The gateway fans
+out transcripts, MCP responses and listening-state changes to every
+connected client as {"type": "message", ...} and {"type": "status", ...}
+frames. Each client has its own bounded send queue: when a client falls
+behind, its oldest message frames are dropped and status frames are
+coalesced to the latest state, so one slow consumer never holds up the rest.
+"""
+import asyncio
+import json
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+import websockets
+
+from recognizers import BACKENDS
+from server import DATABASE, LAYOUT, describe_error, message_queue, process_voice_command, voice_recognizer
+from transcript import TranscriptWriter
+from workers import LayoutError, require_single
+
+# Map message_queue sources to the roles client.py displays
+ROLES = {"user": "user", "mcp": "assistant", "system": "system"}
+
+class Subscriber:
+    """One connected client and its bounded queue of pre-encoded frames"""
+
+    def __init__(self, websocket, max_pending: int):
+        self.websocket = websocket
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.status = None  # Latest status frame, coalesced
+        self.wakeup = asyncio.Event()
+        self.dropped = 0
+
+    def offer(self, frame: str, coalesce: bool = False):
+        if coalesce:
+            self.status = frame
+        else:
+            if len(self.pending) >= self.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            self.pending.append(frame)
+        self.wakeup.set()
+
+    async def pump(self):
+        """Send queued frames until the connection closes"""
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while self.status is not None or self.pending:
+                    if self.status is not None:
+                        frame, self.status = self.status, None
+                    else:
+                        frame = self.pending.popleft()
+                    await self.websocket.send(frame)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+class Gateway:
+    """Fans out voice/MCP events to WebSocket clients and routes their commands"""
+
+    def __init__(self, max_pending: int = 256,
+                 recognizer: str = "google", recognizer_options: Optional[dict] = None):
+        self.max_pending = max_pending
+        self.recognizer = recognizer
+        self.recognizer_options = recognizer_options
+        self.subscribers = set()
+        self.stop_event = threading.Event()
+        self.recognizer_active = threading.Event()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.tasks = set()
+
+    def message_frame(self, role: str, content: str, reply_to=None) -> str:
+        frame = {
+            "type": "message",
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now().isoformat()
+        }
+        if reply_to is not None:
+            frame["reply_to"] = reply_to
+        return json.dumps(frame)
+
+    def status_frame(self) -> str:
+        return json.dumps({"type": "status", "listening": self.recognizer_active.is_set()})
+
+    def broadcast(self, frame: str, coalesce: bool = False, exclude=None):
+        """Queue an encoded frame for every subscriber (must run on the loop)"""
+        for subscriber in self.subscribers:
+            if subscriber is not exclude:
+                subscriber.offer(frame, coalesce)
+
+    def publish(self, message: dict):
+        """Forward a message_queue entry to all subscribers"""
+        role = ROLES.get(message.get("source"), "system")
+        self.broadcast(self.message_frame(role, message["content"]))
+
+    def forward_message_queue(self):
+        """Thread draining message_queue (voice transcripts and responses) onto the loop"""
+        while not self.stop_event.is_set():
+            try:
+                message = message_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.loop.call_soon_threadsafe(self.publish, message)
+
+    def toggle_listening(self):
+        if self.recognizer_active.is_set():
+            self.recognizer_active.clear()
+        else:
+            self.recognizer_active.set()
+        self.broadcast(self.status_frame(), coalesce=True)
+
+    async def handle_text(self, subscriber: Subscriber, message: dict):
+        content = str(message.get("content", "")).strip()
+        if not content:
+            return
+        reply_to = message.get("id")
+        # The sender already shows its own text; other clients need the transcript
+        self.broadcast(self.message_frame("user", content), exclude=subscriber)
+        transcript = message_queue.transcript
+        if transcript is not None:
+            transcript.record({"source": "user", "content": content})
+        try:
+            response = await asyncio.wrap_future(process_voice_command(content))
+        except Exception as e:
+            # The sender still gets a reply_to frame, so its pending entry is resolved
+            error = describe_error(e)
+            if transcript is not None:
+                transcript.record({"source": "system", "content": error})
+            self.broadcast(self.message_frame("system", error, reply_to))
+            return
+        if transcript is not None:
+            transcript.record({"source": "mcp", "content": response})
+        self.broadcast(self.message_frame("assistant", response, reply_to))
+
+    async def handle_client(self, websocket):
+        subscriber = Subscriber(websocket, self.max_pending)
+        self.subscribers.add(subscriber)
+        subscriber.offer(self.status_frame(), coalesce=True)
+        pump = asyncio.create_task(subscriber.pump())
+        try:
+            async for raw in websocket:
+                try:
+                    decoded = json.loads(raw)
+                except ValueError:
+                    continue
+                # Clients may batch several frames into one JSON array
+                for message in decoded if isinstance(decoded, list) else [decoded]:
+                    if not isinstance(message, dict):
+                        continue
+                    if message.get("type") == "message":
+                        task = asyncio.create_task(self.handle_text(subscriber, message))
+                        self.tasks.add(task)
+                        task.add_done_callback(self.tasks.discard)
+                    elif message.get("type") == "command" and message.get("command") == "toggle_listening":
+                        self.toggle_listening()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            pump.cancel()
+
+    async def serve(self, host: str = "localhost", port: int = 8765, voice: bool = True):
+        self.loop = asyncio.get_running_loop()
+        threading.Thread(target=self.forward_message_queue, daemon=True).start()
+        if voice:
+            threading.Thread(
+                target=voice_recognizer,
+                args=(self.stop_event, self.recognizer_active),
+                kwargs={"backend": self.recognizer, "backend_options": self.recognizer_options},
+                daemon=True
+            ).start()
+        try:
+            async with websockets.serve(self.handle_client, host, port):
+                print(f"Gateway listening on ws://{host}:{port}")
+                await asyncio.Future()
+        finally:
+            self.stop_event.set()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="WebSocket gateway for client.py")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-pending", type=int, default=256,
+                        help="frames buffered per client before the oldest are dropped")
+    parser.add_argument("--no-voice", action="store_true", help="do not start the microphone thread")
+    parser.add_argument("--recognizer", choices=sorted(BACKENDS), default="google",
+                        help="speech recognition backend (sphinx and vosk run offline)")
+    parser.add_argument("--vosk-model", default="model", help="path to a Vosk model directory")
+    parser.add_argument("--transcript", help="append the session transcript to this file (replay with transcript.py)")
+    args = parser.parse_args()
+    try:
+        require_single(DATABASE, LAYOUT)
+    except LayoutError as e:
+        parser.error(str(e))
+
+    recognizer_options = {"model_path": args.vosk_model} if args.recognizer == "vosk" else {}
+    if args.transcript:
+        message_queue.transcript = TranscriptWriter(args.transcript)
+    gateway = Gateway(max_pending=args.max_pending, recognizer=args.recognizer,
+                      recognizer_options=recognizer_options)
+    try:
+        asyncio.run(gateway.serve(args.host, args.port, voice=not args.no_voice))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if message_queue.transcript is not None:
+            message_queue.transcript.close()
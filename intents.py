@@ -0,0 +1,393 @@
+"""
+Data-driven intent routing for voice and text commands.
+
+Intents are declared next to the tools they call:
+
+    @router.intent("check_balance", any_of=["balance", "how many days"],
+                   required={"employee_id": "Please specify a valid employee ID."})
+    @mcp.tool()
+    def get_leave_balance(employee_id: str) -> str: ...
+
+Every intent keyword and slot extractor is compiled into one alternation
+regex, so routing is a single left-to-right pass over the utterance; matched
+keywords set bits that are tested against each intent's masks. Keywords match
+whole words ("hi" does not match inside "history" or "this"), so a keyword
+lists the forms it accepts: "leave|leaves" matches either and sets one bit.
+When several intents match, the lowest priority wins.
+
+While an utterance is still being spoken, a Speculation resolves its partial
+transcripts and prefetches read-only tool calls (e.g. get_leave_balance once
+an employee id is heard); route_async commits a prefetch that matches the
+final transcript and discards the rest.
+"""
+import asyncio
+import inspect
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, Union
+
+from cache import freeze
+from metrics import metrics
+
+class Intent:
+    """One routable intent: keyword terms, required slots and a handler"""
+
+    def __init__(self, name: str, handler: Callable[[Dict[str, Any]], str],
+                 any_of: Iterable[str] = (), all_of: Iterable[str] = (),
+                 required: Optional[Dict[str, str]] = None, defaults: Optional[Dict[str, Any]] = None,
+                 priority: int = 100, error: Optional[str] = None, tool: Optional[str] = None):
+        self.name = name
+        self.handler = handler
+        self.tool = tool  # SimpleMCP tool name, awaited natively by route_async
+        self.any_of = tuple(any_of)
+        self.all_of = tuple(all_of)
+        self.required = required or {}
+        self.defaults = defaults or {}
+        self.priority = priority
+        self.error = error
+
+class Slot:
+    """A slot extractor: a regex whose "value" group is post-processed"""
+
+    def __init__(self, name: str, pattern: str, convert: Optional[Callable[[str], Any]] = None,
+                 multiple: bool = False):
+        self.name = name
+        self.pattern = pattern
+        self.convert = convert
+        self.multiple = multiple
+
+class Speculation:
+    """Read-only tool calls started from the partial transcripts of one utterance
+
+    Only tools registered with cache=True are prefetched, so discarding a
+    prefetch never leaves a side effect behind. A prefetch whose cache tag
+    was invalidated (e.g. a leave was applied) since it started is not
+    committed.
+    """
+
+    def __init__(self, engine: "IntentEngine"):
+        self.engine = engine
+        # (tool, frozen arguments) -> (future, cache tag generation at start)
+        self.prefetched: Dict[Hashable, Tuple[Future, int]] = {}
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def update(self, partial: str):
+        """Resolve a partial hypothesis and prefetch the tool call it implies"""
+        intent, arguments = self.engine.resolve(partial)
+        if intent is None or intent.tool is None:
+            return
+        mcp = self.engine.mcp
+        invoker = mcp.tool_invokers[intent.tool]
+        if invoker.cache is None or invoker.invalidates is not None:
+            return
+        params = invoker.bind(arguments)
+        key = (intent.tool, freeze(params))
+        with self.lock:
+            if self.closed or key in self.prefetched:
+                return
+            tag = params.get(invoker.cache_tag) if invoker.cache_tag else None
+            generation = mcp.cache.generation(tag)
+            self.prefetched[key] = (mcp.submit_tool(intent.tool, **arguments), generation)
+        self.engine.count("prefetched")
+
+    def commit(self, intent: Intent, arguments: Dict[str, Any]) -> Optional[Future]:
+        """The prefetch matching the final intent, if still valid; every other one is discarded"""
+        with self.lock:
+            self.closed = True
+            prefetched, self.prefetched = self.prefetched, {}
+        if intent.tool is not None and prefetched:
+            invoker = self.engine.mcp.tool_invokers[intent.tool]
+            params = invoker.bind(arguments)
+            entry = prefetched.get((intent.tool, freeze(params)))
+            tag = params.get(invoker.cache_tag) if invoker.cache_tag else None
+            if entry is not None and self.engine.mcp.cache.generation(tag) == entry[1]:
+                del prefetched[(intent.tool, freeze(params))]
+                self.cancel(prefetched)
+                self.engine.count("committed")
+                return entry[0]
+        self.cancel(prefetched)
+        return None
+
+    def cancel(self, prefetched: Dict[Hashable, Tuple[Future, int]]):
+        for future, _ in prefetched.values():
+            future.cancel()
+        if prefetched:
+            self.engine.count("discarded", len(prefetched))
+
+    def discard(self):
+        """Cancel every prefetch, e.g. when the final transcript never arrives"""
+        with self.lock:
+            self.closed = True
+            prefetched, self.prefetched = self.prefetched, {}
+        self.cancel(prefetched)
+
+class IntentEngine:
+    """Routes utterances to SimpleMCP tools, resources or plain functions"""
+
+    def __init__(self, mcp, fallback: str = "I'm not sure how to handle that request."):
+        self.mcp = mcp
+        self.fallback = fallback
+        self.intents: List[Intent] = []
+        self.slots: Dict[str, Slot] = {}
+        # (regex, regex group name -> Slot, keyword form -> bit, ordered intent masks),
+        # replaced as a whole so a parse on another thread never sees half of a rebuild
+        self.compiled: Optional[Tuple[re.Pattern, Dict[str, Slot], Dict[str, int], list]] = None
+        # Serializes declarations with compile, so a rebuild never publishes a stale table
+        self.compile_lock = threading.Lock()
+        # Speculative prefetch counters (see Speculation)
+        self.speculation = {"prefetched": 0, "committed": 0, "discarded": 0}
+        self.stats_lock = threading.Lock()
+
+    def slot(self, name: str, pattern: str, convert: Optional[Callable[[str], Any]] = None,
+             multiple: bool = False):
+        """Declare a slot; pattern must contain a (?P<value>...) group and start at a word boundary"""
+        with self.compile_lock:
+            self.slots[name] = Slot(name, pattern, convert, multiple)
+            self.compiled = None
+
+    def add(self, intent: Intent):
+        with self.compile_lock:
+            self.intents.append(intent)
+            self.compiled = None
+
+    def intent(self, name: str, any_of: Iterable[str] = (), all_of: Iterable[str] = (),
+               required: Optional[Dict[str, str]] = None, defaults: Optional[Dict[str, Any]] = None,
+               priority: Optional[int] = None, error: Optional[str] = None):
+        """Decorator declaring the utterances that route to a tool, resource or function"""
+        def decorator(func):
+            tool = func.__name__ if self.mcp.tools.get(func.__name__) is func else None
+            self.add(Intent(
+                name, self.handler_for(func), any_of, all_of, required, defaults,
+                len(self.intents) if priority is None else priority, error, tool
+            ))
+            return func
+        return decorator
+
+    def handler_for(self, func: Callable) -> Callable[[Dict[str, Any]], str]:
+        """Dispatch through SimpleMCP when func is a registered tool or resource"""
+        name = func.__name__
+        if self.mcp.tools.get(name) is func:
+            return lambda slots: self.mcp.execute_tool(name, **slots)
+        for pattern, resource in self.mcp.resources.items():
+            if resource is func:
+                scheme = pattern.partition("://")[0]
+                return lambda slots: self.mcp.execute_resource(scheme, **slots)
+        # Plain functions only receive the slots they declare
+        params = tuple(inspect.signature(func).parameters)
+        return lambda slots: func(**{k: v for k, v in slots.items() if k in params})
+
+    def compile(self):
+        """Build the single alternation regex over all keywords and slots"""
+        with self.compile_lock:
+            compiled = self._build()
+            self.compiled = compiled
+        return compiled
+
+    def _build(self):
+        slots, intents = self.slots.values(), self.intents
+        slot_parts = []
+        groups: Dict[str, Slot] = {}
+        # Slots come first so e.g. "i am sam" is read as a name, not keywords
+        for index, slot in enumerate(slots):
+            group = f"s{index}"
+            inner = slot.pattern.replace("(?P<value>", f"(?P<{group}_value>")
+            slot_parts.append(f"(?P<{group}>{inner})")
+            groups[group] = slot
+        # Each keyword gets a bit, shared by its forms; intents test their keywords as bitmasks
+        keywords = sorted({k for i in intents for k in i.any_of + i.all_of})
+        bits = {keyword: 1 << index for index, keyword in enumerate(keywords)}
+        keyword_bits = {" ".join(form.lower().split()): bits[keyword]
+                        for keyword in keywords for form in keyword.split("|")}
+        # Longer phrases first so "how many days" wins over any shorter overlap
+        forms = sorted(keyword_bits, key=len, reverse=True)
+        phrases = "|".join(r"\s+".join(re.escape(word) for word in form.split()) for form in forms)
+        alternatives = slot_parts + [rf"(?P<keyword>(?:{phrases})\b)"] if forms else slot_parts
+        # One shared word-boundary anchor lets the scan skip mid-word positions quickly
+        regex = re.compile(r"\b(?:" + "|".join(alternatives) + ")", re.IGNORECASE)
+        ordered = []
+        for intent in sorted(intents, key=lambda i: i.priority):
+            any_mask = 0
+            for keyword in intent.any_of:
+                any_mask |= bits[keyword]
+            all_mask = 0
+            for keyword in intent.all_of:
+                all_mask |= bits[keyword]
+            ordered.append((intent, any_mask, all_mask))
+        return regex, groups, keyword_bits, ordered
+
+    def parse(self, utterance: str) -> Tuple[Optional[Intent], Dict[str, Any]]:
+        """Single pass over the utterance: matched intent (or None) and its slots"""
+        compiled = self.compiled
+        if compiled is None:
+            compiled = self.compile()
+        regex, groups, keyword_bits, ordered = compiled
+        seen = 0
+        slots: Dict[str, Any] = {}
+        for match in regex.finditer(utterance):
+            group = match.lastgroup
+            if group == "keyword":
+                seen |= keyword_bits[" ".join(match.group(group).lower().split())]
+                continue
+            slot = groups[group]
+            value = match.group(f"{group}_value")
+            if slot.convert is not None:
+                value = slot.convert(value)
+                if value is None:
+                    continue
+            if slot.multiple:
+                slots.setdefault(slot.name, []).append(value)
+            elif slot.name not in slots:
+                slots[slot.name] = value
+        for intent, any_mask, all_mask in ordered:
+            if any_mask and not seen & any_mask:
+                continue
+            if seen & all_mask != all_mask:
+                continue
+            return intent, slots
+        return None, slots
+
+    def resolve(self, utterance: str) -> Tuple[Optional[Intent], Union[Dict[str, Any], str]]:
+        """The intent and its arguments, or (None, reply) when it cannot run"""
+        intent, slots = self.parse(utterance)
+        if intent is None:
+            return None, self.fallback
+        for slot_name, prompt in intent.required.items():
+            if slot_name not in slots:
+                return None, prompt
+        arguments = dict(intent.defaults)
+        arguments.update(slots)
+        return intent, arguments
+
+    def route(self, utterance: str) -> str:
+        """Resolve and execute the intent for an utterance"""
+        intent, arguments = self.resolve(utterance)
+        if intent is None:
+            return arguments
+        try:
+            return intent.handler(arguments)
+        except Exception as e:
+            if intent.error is None:
+                raise
+            return f"{intent.error}: {str(e)}"
+
+    def speculate(self) -> Speculation:
+        """A Speculation for an utterance whose partial transcripts are about to arrive"""
+        return Speculation(self)
+
+    def count(self, outcome: str, n: int = 1):
+        with self.stats_lock:
+            self.speculation[outcome] += n
+
+    def speculation_stats(self) -> Dict[str, int]:
+        with self.stats_lock:
+            return dict(self.speculation)
+
+    async def route_async(self, utterance: str, speculation: Optional[Speculation] = None) -> str:
+        """route() for the tool loop: tools are awaited, other handlers run on its executor
+
+        A matching prefetch from speculation is awaited instead of calling the tool again.
+        """
+        with metrics.span("route"):
+            intent, arguments = self.resolve(utterance)
+        if intent is None:
+            if speculation is not None:
+                speculation.discard()
+            return arguments
+        prefetched = speculation.commit(intent, arguments) if speculation is not None else None
+        try:
+            if prefetched is not None:
+                return await asyncio.wrap_future(prefetched)
+            if intent.tool is not None:
+                return await self.mcp.call_tool(intent.tool, **arguments)
+            return await asyncio.get_running_loop().run_in_executor(None, intent.handler, arguments)
+        except Exception as e:
+            if intent.error is None:
+                raise
+            return f"{intent.error}: {str(e)}"
+
+# Spoken digits as recognizers tend to transcribe them
+NUMBER_WORDS = {
+    "zero": "0", "oh": "0", "o": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+    "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9",
+}
+
+class EmployeeIdIndex:
+    """Incrementally maintained index of employee ids that understands spoken forms
+
+    "E001", "e 001", "E-001" and "e zero zero one" all resolve to E001. The
+    slot pattern only starts on the letter prefixes that actually occur in the
+    directory, and resolving a candidate is a few hash lookups, so the cost is
+    proportional to the utterance rather than to the number of employees.
+    """
+
+    def __init__(self, employee_ids: Iterable[str] = ()):
+        self.ids: Dict[str, str] = {}  # Normalized key -> canonical id
+        self.prefix_counts: Dict[str, int] = {}
+        self.listeners: List[Callable[[], None]] = []
+        for emp_id in employee_ids:
+            self.add(emp_id)
+
+    @staticmethod
+    def split(emp_id: str) -> Tuple[str, str]:
+        """Split an id into its letter prefix and the rest, e.g. "E001" -> ("e", "001")"""
+        key = re.sub(r"[^0-9a-z]", "", emp_id.lower())
+        match = re.match(r"[a-z]*", key)
+        return match.group(0), key[match.end():]
+
+    def add(self, emp_id: str):
+        prefix, rest = self.split(emp_id)
+        key = prefix + rest
+        if key in self.ids:
+            self.ids[key] = emp_id
+            return
+        self.ids[key] = emp_id
+        self.prefix_counts[prefix] = self.prefix_counts.get(prefix, 0) + 1
+        if self.prefix_counts[prefix] == 1:
+            self.notify()
+
+    def remove(self, emp_id: str):
+        prefix, rest = self.split(emp_id)
+        if self.ids.pop(prefix + rest, None) is None:
+            return
+        self.prefix_counts[prefix] -= 1
+        if not self.prefix_counts[prefix]:
+            del self.prefix_counts[prefix]
+            self.notify()
+
+    def notify(self):
+        # The slot pattern depends on the set of prefixes
+        for listener in self.listeners:
+            listener()
+
+    def pattern(self) -> str:
+        """Slot pattern for IntentEngine: a known prefix followed by spoken or written digits"""
+        prefixes = "|".join(sorted((re.escape(p) for p in self.prefix_counts if p), key=len, reverse=True))
+        if not prefixes:
+            return r"(?!)(?P<value>)"
+        digit = "|".join([r"\d+(?![\d-])"] + sorted(NUMBER_WORDS, key=len, reverse=True))
+        return rf"(?P<value>(?:{prefixes})(?:[\s-]*(?:{digit})\b)+)"
+
+    def resolve(self, text: str) -> Optional[str]:
+        """Canonical employee id for a written or spoken candidate, or None"""
+        # "e001", "e 001" and "e zero zero one" all split into the prefix and digit words
+        words = re.findall(r"[a-z]+|\d+", text.lower())
+        if not words or not words[0].isalpha():
+            return None
+        prefix = words[0]
+        digits = [NUMBER_WORDS.get(word, word) for word in words[1:]]
+        # Longest known id wins, so trailing numbers ("e001 2 days") are ignored; only
+        # whole words are dropped, so a mistyped "E0021" never resolves to E002
+        for end in range(len(digits), 0, -1):
+            emp_id = self.ids.get(prefix + "".join(digits[:end]))
+            if emp_id is not None:
+                return emp_id
+        return None
+
+    def __contains__(self, emp_id: str) -> bool:
+        prefix, rest = self.split(emp_id)
+        return prefix + rest in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
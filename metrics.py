@@ -0,0 +1,199 @@
+"""
+Latency spans for the voice pipeline, aggregated into histograms.
+
+    with metrics.span("execute_tool", tool="apply_leave"):
+        ...
+
+Stages recorded by the server: mic_open, calibrate, listen, recognize,
+route, command (a whole voice or text command), execute_tool, queue_wait
+(message_queue put to drain) and render (Tk update). Histograms use fixed
+exponential buckets, so recording is a bisect and two additions. They are
+exposed as JSON (snapshot), as Prometheus text on an optional HTTP /metrics
+endpoint, and in the GUI's stats panel.
+
+Metrics are off unless enabled (VOICE_MCP_METRICS=1 or --metrics); a
+disabled span() returns a shared no-op context manager.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Tuple
+
+# Upper bounds in seconds: 10 us doubling up to ~84 s
+BUCKETS = tuple(0.00001 * 2 ** i for i in range(24))
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+    __slots__ = ("counts", "count", "sum", "max", "lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                "count": self.count,
+                "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+                "p50_ms": round(self.quantile(0.5) * 1000, 3),
+                "p95_ms": round(self.quantile(0.95) * 1000, 3),
+                "p99_ms": round(self.quantile(0.99) * 1000, 3),
+                "max_ms": round(self.max * 1000, 3),
+            }
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+class Metrics:
+    """Registry of stage histograms keyed by (stage, labels)"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, stage: str, labels: Dict[str, Any]) -> Histogram:
+        key = (stage, tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ())
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def span(self, stage: str, **labels):
+        """Context manager timing one stage; a no-op when disabled"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self.histogram(stage, labels))
+
+    def observe(self, stage: str, seconds: float, **labels):
+        if self.enabled:
+            self.histogram(stage, labels).observe(seconds)
+
+    def time_future(self, stage: str, future, **labels):
+        """Record the time until a concurrent future completes"""
+        if not self.enabled:
+            return future
+        histogram = self.histogram(stage, labels)
+        start = time.perf_counter()
+        future.add_done_callback(lambda _: histogram.observe(time.perf_counter() - start))
+        return future
+
+    def items(self):
+        with self.lock:
+            return sorted(self.histograms.items())
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage summaries, e.g. {"execute_tool{tool=apply_leave}": {"p50_ms": ...}}"""
+        result = {}
+        for (stage, labels), histogram in self.items():
+            name = stage + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+            result[name] = histogram.summary()
+        return result
+
+    def summary_text(self) -> str:
+        """Human-readable table for the stats panel"""
+        if not self.enabled:
+            return "Latency metrics are disabled (start with --metrics)."
+        rows = [f"{'stage':<36} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+        for name, stats in self.snapshot().items():
+            rows.append(f"{name:<36} {stats['count']:>7} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+        return "\n".join(rows)
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of every histogram"""
+        lines = ["# TYPE voice_mcp_stage_seconds histogram"]
+        for (stage, labels), histogram in self.items():
+            label_text = ",".join([f'stage="{stage}"'] + [f'{k}="{v}"' for k, v in labels])
+            with histogram.lock:
+                counts = list(histogram.counts)
+                total, count = histogram.sum, histogram.count
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'voice_mcp_stage_seconds_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f"voice_mcp_stage_seconds_sum{{{label_text}}} {total}")
+            lines.append(f"voice_mcp_stage_seconds_count{{{label_text}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host: str = "127.0.0.1", port: int = 9100):
+        """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread"""
+        # Imported here so processes that never serve metrics skip http.server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+# Process-wide registry used by the server, intents and GUI
+metrics = Metrics(enabled=os.environ.get("VOICE_MCP_METRICS") == "1")
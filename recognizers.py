@@ -0,0 +1,171 @@
+"""
+Pluggable speech-recognition backends and an out-of-process decoding pool.
+
+Backends share one interface: recognize(audio) returns the transcript or
+raises sr.UnknownValueError / sr.RequestError, like speech_recognition does.
+"google" is the original network recognizer; "sphinx" (PocketSphinx) and
+"vosk" run fully offline, and "stub" returns canned text for benchmarks.
+
+RecognitionPool decodes utterances in worker processes, each of which builds
+its backend (and loads any model) once. Capture only submits audio and moves
+on, so the microphone keeps listening while earlier utterances decode.
+Futures are returned in submission order so callers can deliver results in
+the order the utterances were spoken.
+"""
+import json
+import multiprocessing
+import time
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import speech_recognition as sr
+
+class RecognizerBackend:
+    """Base class for speech-to-text engines"""
+    name = "base"
+    offline = False
+
+    def __init__(self, **options):
+        self.options = options
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        raise NotImplementedError
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API (network round trip per utterance)"""
+    name = "google"
+
+    def __init__(self, language: str = "en-US", **options):
+        super().__init__(**options)
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+class SphinxBackend(RecognizerBackend):
+    """CMU PocketSphinx through speech_recognition (offline)"""
+    name = "sphinx"
+    offline = True
+
+    def __init__(self, language: str = "en-US", keyword_entries=None, grammar: Optional[str] = None,
+                 **options):
+        super().__init__(**options)
+        self.language = language
+        self.keyword_entries = keyword_entries
+        self.grammar = grammar
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        return self.recognizer.recognize_sphinx(
+            audio, language=self.language, keyword_entries=self.keyword_entries, grammar=self.grammar)
+
+class VoskBackend(RecognizerBackend):
+    """Vosk/Kaldi local model (offline)"""
+    name = "vosk"
+    offline = True
+    sample_rate = 16000
+
+    def __init__(self, model_path: str = "model", grammar: Optional[List[str]] = None, **options):
+        super().__init__(**options)
+        # A small grammar (e.g. a wake phrase plus "[unk]") makes decoding much cheaper
+        self.grammar = json.dumps(grammar) if grammar else None
+        try:
+            import vosk
+        except ImportError:
+            raise sr.RequestError("missing vosk module: ensure that vosk is set up correctly.")
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        # Loading the model is the expensive part, so it happens once per worker
+        self.model = vosk.Model(model_path)
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        if self.grammar:
+            recognizer = self.vosk.KaldiRecognizer(self.model, self.sample_rate, self.grammar)
+        else:
+            recognizer = self.vosk.KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+class StubBackend(RecognizerBackend):
+    """Canned transcripts for benchmarks and headless runs (no model, no network)
+
+    The transcript is picked by a checksum of the audio, so the same
+    utterance always decodes to the same text; delay simulates decode time.
+    """
+    name = "stub"
+    offline = True
+
+    def __init__(self, transcripts=("check balance for E001",), delay: float = 0.0, **options):
+        super().__init__(**options)
+        self.transcripts = list(transcripts)
+        self.delay = delay
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        return self.transcripts[zlib.crc32(audio.frame_data) % len(self.transcripts)]
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    SphinxBackend.name: SphinxBackend,
+    VoskBackend.name: VoskBackend,
+    StubBackend.name: StubBackend,
+}
+
+def create_backend(name: str, **options) -> RecognizerBackend:
+    """Build a registered backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown recognizer backend '{name}'. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
+
+# Each worker process holds its own backend instance
+_worker_backend: Optional[RecognizerBackend] = None
+
+def _init_worker(name: str, options: Dict[str, Any]):
+    global _worker_backend
+    _worker_backend = create_backend(name, **options)
+
+def _recognize_in_worker(frame_data: bytes, sample_rate: int, sample_width: int) -> str:
+    return _worker_backend.recognize(sr.AudioData(frame_data, sample_rate, sample_width))
+
+class RecognitionPool:
+    """Decodes utterances in worker processes, decoupled from audio capture"""
+
+    def __init__(self, backend: str = "google", workers: int = 2, **options):
+        self.backend = backend
+        self.options = options
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        # Fail fast on a bad backend name before spawning workers
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown recognizer backend '{self.backend}'. Available: {', '.join(BACKENDS)}")
+        # The pool starts lazily while the tool loop, capture and transcript threads run;
+        # forking a multithreaded process can deadlock the child, so workers come from a
+        # single-threaded fork server (spawn where that is unavailable)
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(method),
+            initializer=_init_worker,
+            initargs=(self.backend, self.options)
+        )
+
+    def submit(self, audio: sr.AudioData) -> Future:
+        """Queue an utterance for decoding; the future resolves to its transcript"""
+        if self.executor is None:
+            self.start()
+        return self.executor.submit(
+            _recognize_in_worker, audio.frame_data, audio.sample_rate, audio.sample_width)
+
+    def shutdown(self, wait: bool = False):
+        """Stop the workers; wait=True lets queued utterances finish decoding first"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.executor = None
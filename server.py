@@ -1,286 +1,933 @@
-import speech_recognition as sr
+import asyncio
+import functools
+import os
+import sys
 import threading
 import time
-import tkinter as tk
-from tkinter import scrolledtext
 import queue
 import inspect
-from typing import List, Dict, Any, Callable, Optional, Union
+import re
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable, Optional, Union
+
+from bus import Message, MessageBus
+from cache import MISSING, ResultCache, freeze
+from conversation import ConversationView
+from metrics import metrics
+from transcript import TranscriptWriter
+from intents import EmployeeIdIndex, IntentEngine
+from store import DuplicateLeave, EmployeeNotFound, InsufficientBalance, InvalidLeaveDate, LeaveStore, shard_of
+from transport import serve
+from workers import LayoutError, current_layout, require_single, serve_sharded
+
+# speech_recognition, audio capture and Tk are heavy and need devices, so they
+# are imported only when the voice loop or the GUI starts; headless servers
+# never load them
+tk = None
+scrolledtext = None
+
+def _import_tk():
+    global tk, scrolledtext
+    if tk is None:
+        import tkinter
+        from tkinter import scrolledtext as tk_scrolledtext
+        tk, scrolledtext = tkinter, tk_scrolledtext
+
+# Coercers for annotated tool parameters, keyed by annotation
+def _coerce_str(value):
+    return value if type(value) is str else str(value)
+
+def _coerce_int(value):
+    return value if type(value) is int else int(value)
+
+def _coerce_float(value):
+    return value if type(value) is float else float(value)
+
+def _coerce_bool(value):
+    if type(value) is bool:
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+def _coerce_list(value):
+    if type(value) is list:
+        return value
+    # A single string is one item, not a sequence of characters
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+# JSON Schema types advertised in tools/list
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    List: "array",
+    dict: "object",
+    Dict: "object",
+}
+
+_COERCERS = {
+    str: _coerce_str,
+    int: _coerce_int,
+    float: _coerce_float,
+    bool: _coerce_bool,
+    list: _coerce_list,
+    List: _coerce_list,
+}
+
+def _json_schema_for(annotation) -> Dict[str, Any]:
+    """Describe a parameter annotation as a JSON Schema fragment"""
+    origin = getattr(annotation, "__origin__", None)
+    json_type = _JSON_TYPES.get(annotation) or _JSON_TYPES.get(origin)
+    if json_type is None:
+        return {}
+    schema = {"type": json_type}
+    args = getattr(annotation, "__args__", None)
+    if json_type == "array" and args and args[0] in _JSON_TYPES:
+        schema["items"] = {"type": _JSON_TYPES[args[0]]}
+    return schema
+
+def _coercer_for(annotation) -> Optional[Callable[[Any], Any]]:
+    """Map a parameter annotation to a coercer (None if no coercion applies)"""
+    if annotation is inspect.Parameter.empty:
+        return None
+    if annotation in _COERCERS:
+        return _COERCERS[annotation]
+    # Generic aliases like List[str] coerce by their origin
+    origin = getattr(annotation, "__origin__", None)
+    return _COERCERS.get(origin)
+
+class ToolTimeout(TimeoutError):
+    """Raised when a tool runs longer than its timeout"""
+    def __init__(self, name: str, timeout: float):
+        super().__init__(f"Tool '{name}' timed out after {timeout:g}s")
+        self.name = name
+        self.timeout = timeout
+
+class Invoker:
+    """A callable compiled once at registration so dispatch needs no reflection"""
+    __slots__ = ("func", "name", "description", "params", "required", "defaults", "coercers",
+                 "var_kwargs", "is_async", "input_schema", "cache", "cache_tag", "invalidates", "ttl",
+                 "timeout", "limiter")
+
+    def __init__(self, func: Callable, cache: Optional[ResultCache] = None,
+                 cache_tag: Optional[str] = None, invalidates: Optional[str] = None,
+                 ttl: Optional[float] = None, timeout: Optional[float] = None,
+                 max_concurrency: Optional[int] = None):
+        self.func = func
+        # Read-only callables cache their results under the cache_tag argument;
+        # writers evict every entry tagged with their invalidates argument
+        self.cache = cache
+        self.cache_tag = cache_tag
+        self.invalidates = invalidates
+        self.ttl = ttl
+        self.timeout = timeout
+        # Only ever used on the SimpleMCP tool loop
+        self.limiter = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.name = func.__name__
+        self.description = inspect.getdoc(func) or ""
+        self.is_async = inspect.iscoroutinefunction(func)
+        sig = inspect.signature(func)
+        params = []
+        defaults = {}
+        coercers = {}
+        properties = {}
+        required = []
+        var_kwargs = False
+        for param_name, param in sig.parameters.items():
+            if param.kind is inspect.Parameter.VAR_KEYWORD:
+                var_kwargs = True
+                continue
+            if param.kind is inspect.Parameter.VAR_POSITIONAL:
+                continue
+            params.append(param_name)
+            properties[param_name] = _json_schema_for(param.annotation)
+            if param.default is not inspect.Parameter.empty:
+                defaults[param_name] = param.default
+            else:
+                required.append(param_name)
+            coercer = _coercer_for(param.annotation)
+            if coercer is not None:
+                coercers[param_name] = coercer
+        self.params = tuple(params)
+        self.defaults = defaults
+        self.coercers = coercers
+        self.var_kwargs = var_kwargs
+        self.required = tuple(required)
+        self.input_schema = {"type": "object", "properties": properties, "required": required}
+
+    def bind(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Pick and coerce the arguments this callable accepts"""
+        coercers = self.coercers
+        params = {}
+        for param_name in self.params:
+            if param_name in kwargs:
+                value = kwargs[param_name]
+                coercer = coercers.get(param_name)
+                params[param_name] = coercer(value) if coercer else value
+        if self.var_kwargs:
+            for key, value in kwargs.items():
+                if key not in params:
+                    params[key] = value
+        return params
+
+    def __call__(self, kwargs: Dict[str, Any]):
+        return self.call(self.bind(kwargs))
+
+    @property
+    def needs_loop(self) -> bool:
+        """Whether calls must go through the tool loop rather than run inline"""
+        return self.is_async or self.timeout is not None or self.limiter is not None
+
+    def lookup(self, params: Dict[str, Any]):
+        """(key, tag, generation, cached result or MISSING) for a read-only call"""
+        tag = params.get(self.cache_tag) if self.cache_tag else None
+        key = (self.name, freeze(params))
+        # Read the generation first so a write that lands mid-call is noticed
+        generation = self.cache.generation(tag)
+        return key, tag, generation, self.cache.get(key)
+
+    def call(self, params: Dict[str, Any]):
+        """Invoke a sync callable inline with already bound arguments, through the result cache"""
+        cache = self.cache
+        if cache is None:
+            return self.func(**params)
+        if self.invalidates is not None:
+            try:
+                return self.func(**params)
+            finally:
+                cache.invalidate(params.get(self.invalidates))
+        key, tag, generation, result = self.lookup(params)
+        if result is MISSING:
+            result = self.func(**params)
+            cache.put(key, result, tag, generation, self.ttl)
+        return result
+
+    async def run(self, params: Dict[str, Any], executor: ThreadPoolExecutor):
+        """Invoke on the tool loop with the timeout and concurrency limit, through the result cache"""
+        cache = self.cache
+        if cache is None:
+            return await self._execute(params, executor)
+        if self.invalidates is not None:
+            try:
+                return await self._execute(params, executor)
+            finally:
+                cache.invalidate(params.get(self.invalidates))
+        key, tag, generation, result = self.lookup(params)
+        if result is MISSING:
+            result = await self._execute(params, executor)
+            cache.put(key, result, tag, generation, self.ttl)
+        return result
+
+    async def _execute(self, params: Dict[str, Any], executor: ThreadPoolExecutor):
+        limiter = self.limiter
+        if limiter is not None:
+            await limiter.acquire()
+        if self.is_async:
+            work = asyncio.ensure_future(self.func(**params))
+            if limiter is not None:
+                work.add_done_callback(lambda _: limiter.release())
+        else:
+            loop = asyncio.get_running_loop()
+            future = executor.submit(functools.partial(self.func, **params))
+            if limiter is not None:
+                # A thread cannot be interrupted, so its slot is held until it really returns
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(limiter.release))
+            work = asyncio.wrap_future(future, loop=loop)
+        try:
+            # Cancelling the caller (or timing out) cancels the work
+            return await asyncio.wait_for(work, self.timeout)
+        except asyncio.TimeoutError:
+            if not work.cancelled():
+                raise  # Raised by the tool itself
+            raise ToolTimeout(self.name, self.timeout) from None
+
+class UriTemplate:
+    """A resource pattern like "greeting://{name}" compiled to a matcher"""
+    __slots__ = ("pattern", "scheme", "variables", "regex")
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.scheme, sep, path = pattern.partition("://")
+        self.variables = tuple(re.findall(r'{(\w+)}', path))
+        # Literal text is escaped; each {var} matches one path segment
+        regex = ""
+        pos = 0
+        for match in re.finditer(r'{(\w+)}', path):
+            regex += re.escape(path[pos:match.start()])
+            regex += f"(?P<{match.group(1)}>[^/]+)"
+            pos = match.end()
+        regex += re.escape(path[pos:])
+        self.regex = re.compile(f"^{regex}$")
+
+    def match(self, path: str) -> Optional[Dict[str, str]]:
+        """Extract template variables from the part of a URI after "://" """
+        match = self.regex.match(path)
+        return match.groupdict() if match else None
 
 # Simple implementation of FastMCP-like functionality
 class SimpleMCP:
-    def __init__(self, name: str):
+    def __init__(self, name: str, cache: Optional[ResultCache] = None, max_workers: int = 8):
         self.name = name
+        # Shared by every tool and resource registered with cache=True
+        self.cache = cache if cache is not None else ResultCache()
         self.tools = {}
         self.resources = {}
-        self.resource_patterns = {}
+        # Compiled dispatch tables, filled at registration time
+        self.tool_invokers: Dict[str, Invoker] = {}
+        self.bulk_tools: Dict[str, Callable[[List[Dict[str, Any]]], List[Any]]] = {}
+        self.resource_index: Dict[str, List[tuple]] = {}
+        # Background event loop that runs tool calls; started on first use
+        self.max_workers = max_workers
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.loop_lock = threading.Lock()
+        self.in_flight = set()
+        # Single-flight: (tool, frozen arguments) -> future shared by identical concurrent calls
+        self.flights: Dict[Any, Future] = {}
+        self.flights_lock = threading.Lock()
+        self.coalesced = 0
     
-    def tool(self):
-        """Decorator to register a function as a tool"""
+    def tool(self, cache: bool = False, cache_tag: Optional[str] = None,
+             invalidates: Optional[str] = None, ttl: Optional[float] = None,
+             timeout: Optional[float] = None, max_concurrency: Optional[int] = None):
+        """Decorator to register a function (or coroutine function) as a tool
+
+        cache=True memoizes a read-only tool's results, tagged with the value of
+        its cache_tag argument (e.g. "employee_id"). A tool that writes names the
+        argument whose tag it invalidates, so a leave applied for E001 only
+        evicts E001's cached balance and history.
+
+        timeout (seconds) cancels a call that runs too long with ToolTimeout,
+        and max_concurrency caps how many calls of the tool run at once.
+        """
         def decorator(func):
             self.tools[func.__name__] = func
+            self.tool_invokers[func.__name__] = Invoker(
+                func, self.cache if cache or invalidates else None, cache_tag, invalidates, ttl,
+                timeout, max_concurrency)
+            return func
+        return decorator
+    
+    def bulk(self, tool_name: str):
+        """Decorator to register a vectorized variant of a tool for execute_batch
+
+        The function receives a list of bound argument dicts and returns one
+        result per dict, in order.
+        """
+        def decorator(func):
+            self.bulk_tools[tool_name] = func
             return func
         return decorator
     
-    def resource(self, pattern: str):
-        """Decorator to register a function as a resource"""
+    def resource(self, pattern: str, cache: bool = False, cache_tag: Optional[str] = None,
+                 ttl: Optional[float] = None):
+        """Decorator to register a function as a resource (cache as for tool())"""
         def decorator(func):
-            # Extract the variable pattern from the URL pattern
-            # e.g., "greeting://{name}" -> "name"
-            import re
-            var_pattern = re.search(r'{(\w+)}', pattern)
-            if var_pattern:
-                var_name = var_pattern.group(1)
-                resource_name = pattern.split('://')[0]
-                self.resource_patterns[resource_name] = (func, var_name)
+            # Index by scheme, e.g. "greeting://{name}" -> "greeting"
+            template = UriTemplate(pattern)
+            invoker = Invoker(func, self.cache if cache else None, cache_tag, ttl=ttl)
+            self.resource_index.setdefault(template.scheme, []).append((template, invoker))
             self.resources[pattern] = func
             return func
         return decorator
     
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the tool loop thread (idempotent) and return its loop"""
+        with self.loop_lock:
+            if self.loop is None:
+                self.executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="mcp-tool")
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(self.executor)
+                threading.Thread(target=loop.run_forever, name=f"{self.name}-tools", daemon=True).start()
+                self.loop = loop
+            return self.loop
+
+    def submit(self, coro) -> Future:
+        """Run a coroutine on the tool loop; the returned future can be cancelled"""
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def submit_tool(self, tool_name: str, **kwargs) -> Future:
+        """Start a tool call without waiting for it"""
+        return self.submit(self.call_tool(tool_name, **kwargs))
+
+    async def call_tool(self, tool_name: str, **kwargs):
+        """Execute a registered tool on the tool loop (async tools natively, sync tools on the executor)"""
+        invoker = self.tool_invokers.get(tool_name)
+        if invoker is None:
+            return f"Tool '{tool_name}' not found."
+        return await self._call(invoker, invoker.bind(kwargs))
+
+    async def _call(self, invoker: Invoker, params: Dict[str, Any]):
+        task = asyncio.current_task()
+        while True:
+            key, flight = self._join_flight(invoker, params)
+            if flight is None:
+                break
+            try:
+                # Shielded so a cancelled follower does not cancel the leader's call
+                return await asyncio.shield(asyncio.wrap_future(flight))
+            except asyncio.CancelledError:
+                if not flight.cancelled() or task.cancelling():
+                    raise
+                # Only the leader was cancelled: lead a new call or join another one
+        self.in_flight.add(task)
+        try:
+            with metrics.span("execute_tool", tool=invoker.name):
+                return self._land_flight(key, result=await invoker.run(params, self.executor))
+        except BaseException as e:
+            self._land_flight(key, error=e)
+            raise
+        finally:
+            self.in_flight.discard(task)
+
+    def _join_flight(self, invoker: Invoker, params: Dict[str, Any]):
+        """(key, None) to lead a call, or (None, future) to share an identical one in flight
+
+        Only tools declared read-only (cache=True and no invalidates) share calls:
+        repeating any other tool is not guaranteed to be a no-op. The key carries
+        the cache generation of the call's tag, so a read issued after a write to
+        that employee never joins a read that started before it.
+        """
+        if invoker.cache is None or invoker.invalidates is not None:
+            return None, None
+        tag = params.get(invoker.cache_tag) if invoker.cache_tag else None
+        key = (invoker.name, freeze(params), self.cache.generation(tag))
+        with self.flights_lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return None, flight
+            self.flights[key] = Future()
+        return key, None
+
+    def _land_flight(self, key, result=None, error: Optional[BaseException] = None):
+        """Hand the leader's outcome to every caller that joined its flight"""
+        if key is None:
+            return result
+        with self.flights_lock:
+            flight = self.flights.pop(key)
+        if error is None:
+            flight.set_result(result)
+        elif isinstance(error, (CancelledError, asyncio.CancelledError)):
+            flight.cancel()
+        else:
+            flight.set_exception(error)
+        return result
+
+    def cancel_all(self):
+        """Cancel every tool call in flight, e.g. on shutdown"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(lambda: [task.cancel() for task in list(self.in_flight)])
+
+    def _invoke(self, invoker: Invoker, params: Dict[str, Any]):
+        # Sync tools without limits stay inline; everything else goes through the loop
+        with metrics.span("execute_tool", tool=invoker.name):
+            if invoker.needs_loop:
+                return self.submit(invoker.run(params, self.executor)).result()
+            return invoker.call(params)
+
     def execute_tool(self, tool_name: str, **kwargs) -> str:
-        """Execute a registered tool with given parameters"""
-        if tool_name in self.tools:
-            tool_func = self.tools[tool_name]
-            # Get the required parameters for the function
-            sig = inspect.signature(tool_func)
-            params = {}
-            for param_name, param in sig.parameters.items():
-                if param_name in kwargs:
-                    params[param_name] = kwargs[param_name]
-            
-            # Execute the function with the parameters
-            return tool_func(**params)
-        return f"Tool '{tool_name}' not found."
+        """Execute a registered tool with given parameters, waiting for the result
+
+        Must not be called from the tool loop itself; coroutines there await
+        call_tool instead.
+        """
+        invoker = self.tool_invokers.get(tool_name)
+        if invoker is None:
+            return f"Tool '{tool_name}' not found."
+        params = invoker.bind(kwargs)
+        if invoker.needs_loop:
+            # Identical concurrent calls are coalesced on the loop; inline calls stay
+            # free of the flight table's future and lock
+            return self.submit(self._call(invoker, params)).result()
+        with metrics.span("execute_tool", tool=tool_name):
+            return invoker.call(params)
+    
+    def execute_batch(self, calls: Iterable[Dict[str, Any]]) -> List[Any]:
+        """Execute many {"name": ..., "arguments": {...}} tool calls, returning results in order
+
+        Consecutive calls to the same tool are dispatched together, through
+        its bulk variant when one is registered. Failures are reported per
+        call rather than aborting the batch.
+        """
+        calls = list(calls)
+        results: List[Any] = [None] * len(calls)
+        run_name, run = None, []
+        for index, call in enumerate(calls):
+            name = call.get("name") if isinstance(call, dict) else None
+            if name != run_name and run:
+                self._execute_run(run_name, run, results)
+                run = []
+            run_name = name
+            # A name that is not a string (e.g. a list) cannot even be looked up
+            if not isinstance(name, str) or name not in self.tool_invokers:
+                results[index] = f"Tool '{name}' not found."
+                continue
+            invoker = self.tool_invokers[name]
+            arguments = call.get("arguments") or {}
+            if not isinstance(arguments, dict):
+                results[index] = "Error: tool arguments must be an object."
+                continue
+            try:
+                params = invoker.bind(arguments)
+            except (TypeError, ValueError) as e:
+                results[index] = f"Error: {e}"
+                continue
+            missing = [param for param in invoker.required if param not in params]
+            if missing:
+                results[index] = f"Error: missing required argument(s): {', '.join(missing)}"
+                continue
+            run.append((index, params))
+        if run:
+            self._execute_run(run_name, run, results)
+        return results
+    
+    def _execute_run(self, tool_name: str, run: List[tuple], results: List[Any]):
+        invoker = self.tool_invokers[tool_name]
+        bulk = self.bulk_tools.get(tool_name)
+        if bulk is not None:
+            try:
+                for (index, _), result in zip(run, bulk([params for _, params in run])):
+                    results[index] = result
+            except Exception as e:
+                # The bulk function failed as a whole; only this run's calls report it
+                for index, _ in run:
+                    results[index] = f"Error: {e}"
+            finally:
+                if invoker.invalidates is not None:
+                    for tag in {params.get(invoker.invalidates) for _, params in run}:
+                        invoker.cache.invalidate(tag)
+            return
+        for index, params in run:
+            try:
+                results[index] = self._invoke(invoker, params)
+            except Exception as e:
+                results[index] = f"Error: {e}"
     
     def execute_resource(self, resource_pattern: str, **kwargs) -> str:
         """Execute a registered resource with given parameters"""
-        for pattern, func in self.resources.items():
-            # Check if the pattern matches
-            if pattern.split('://')[0] == resource_pattern:
-                # Extract parameters from the pattern
-                sig = inspect.signature(func)
-                params = {}
-                for param_name, param in sig.parameters.items():
-                    if param_name in kwargs:
-                        params[param_name] = kwargs[param_name]
-                
-                # Execute the function with the parameters
-                return func(**params)
-        
-        # Try resource patterns
-        if resource_pattern in self.resource_patterns:
-            func, var_name = self.resource_patterns[resource_pattern]
-            if var_name in kwargs:
-                return func(kwargs[var_name])
-        
-        return f"Resource '{resource_pattern}' not found."
+        entries = self.resource_index.get(resource_pattern)
+        if not entries:
+            return f"Resource '{resource_pattern}' not found."
+        # The first pattern registered for a scheme handles it
+        template, invoker = entries[0]
+        return self._invoke(invoker, invoker.bind(kwargs))
+    
+    def read_resource(self, uri: str) -> str:
+        """Resolve a full URI like "greeting://Alice" against registered templates"""
+        scheme, sep, path = uri.partition("://")
+        for template, invoker in self.resource_index.get(scheme, ()):
+            variables = template.match(path)
+            if variables is not None:
+                return self._invoke(invoker, invoker.bind(variables))
+        return f"Resource '{uri}' not found."
     
-    def run(self):
-        """Run the MCP server"""
-        print(f"{self.name} MCP Server is running...")
+    def run(self, transport: str = "stdio", host: str = "127.0.0.1", port: int = 8000,
+            max_workers: int = 8):
+        """Run the MCP server, serving JSON-RPC until the transport closes"""
+        # stdout is the protocol channel for stdio, so log to stderr
+        print(f"{self.name} MCP Server is running ({transport})...", file=sys.stderr)
+        asyncio.run(serve(self, transport, host=host, port=port, max_workers=max_workers))
 
-# In-memory mock database with leave days
-employee_leaves = {
+# Initial employees, loaded only when the leave database is empty
+SEED_EMPLOYEES = {
     "E001": {"balance": 18, "history": ["2024-12-25", "2025-01-01"]},
     "E002": {"balance": 20, "history": []}
 }
 
-# Create message queue for communication between threads
-message_queue = queue.Queue()
+DATABASE = os.environ.get("LEAVE_DB", "leaves.db")
+# A worker started by workers.py ("index/count") only holds the employees of its shard
+SHARD = tuple(int(part) for part in os.environ["VOICE_MCP_SHARD"].split("/")) \
+    if os.environ.get("VOICE_MCP_SHARD") else None
+# Whether DATABASE's live data is in worker shards, read before the store below writes to it
+LAYOUT = current_layout(DATABASE) if SHARD is None else 0
+# Durable leave store shared by every tool call; LEAVE_DB=":memory:" keeps it in memory
+store = LeaveStore(DATABASE)
+store.seed({emp_id: data for emp_id, data in SEED_EMPLOYEES.items()
+            if SHARD is None or shard_of(emp_id, SHARD[1]) == SHARD[0]})
+
+# Bounded message bus between the voice thread, the text path and the UI
+message_queue = MessageBus(maxsize=int(os.environ.get("VOICE_MCP_QUEUE_SIZE", "1000")),
+                           policy=os.environ.get("VOICE_MCP_QUEUE_POLICY", "coalesce"))
 
 # Create MCP server
 mcp = SimpleMCP("LeaveManager")
+# Other processes on the same database (gateway.py, server.py) write without invalidating this cache
+mcp.cache.changed = store.changed_elsewhere
+
+# Intent router for voice and text commands; intents are declared with the tools
+router = IntentEngine(
+    mcp, fallback="I'm not sure how to handle that request. Try asking for help to see available commands."
+)
+HISTORY_PAGE_SIZE = 50
+EMPLOYEE_ID_PROMPT = "Please specify a valid employee ID like E001 or E002."
+
+# Employee ids the router can resolve, including spoken forms like "e zero zero one"
+employee_index = EmployeeIdIndex(store.employee_ids())
+
+def _register_employee_slot():
+    router.slot("employee_id", employee_index.pattern(), convert=employee_index.resolve)
+
+employee_index.listeners.append(_register_employee_slot)
+
+def add_employee(employee_id: str, balance: int = 20, history: Optional[List[str]] = None):
+    """Add an employee to the store and the id index"""
+    store.add_employee(employee_id, balance, history or [])
+    employee_index.add(employee_id)
+    mcp.cache.invalidate(employee_id)
+
+def load_employees(records):
+    """Bulk load (employee_id, balance, history) records into the store and the id index"""
+    loaded = []
+    def track():
+        for record in records:
+            loaded.append(record[0])
+            yield record
+    store.bulk_load(track())
+    for employee_id in loaded:
+        employee_index.add(employee_id)
+        mcp.cache.invalidate(employee_id)
+
+def remove_employee(employee_id: str):
+    """Remove an employee from the store and the id index"""
+    store.remove_employee(employee_id)
+    employee_index.remove(employee_id)
+    mcp.cache.invalidate(employee_id)
+
+# Slots extracted from utterances, named after the tool parameters they fill
+_register_employee_slot()
+router.slot("leave_dates", r"(?P<value>\d{4}-\d{2}-\d{2})", multiple=True)
+router.slot("name", r"(?:my name is|i am|call me)\s+(?P<value>\w+)")
 
 # Tool: Check Leave Balance
-@mcp.tool()
+@router.intent("check_balance", any_of=["balance", "how many days"], priority=0,
+               required={"employee_id": EMPLOYEE_ID_PROMPT})
+@mcp.tool(cache=True, cache_tag="employee_id")
 def get_leave_balance(employee_id: str) -> str:
     """Check how many leave days are left for the employee"""
-    data = employee_leaves.get(employee_id)
-    if data:
-        return f"{employee_id} has {data['balance']} leave days remaining."
+    balance = store.get_balance(employee_id)
+    if balance is not None:
+        return f"{employee_id} has {balance} leave days remaining."
     return "Employee ID not found."
 
 # Tool: Apply for Leave with specific dates
-@mcp.tool()
+@router.intent("apply_leave", all_of=["apply|applying", "leave|leaves"], priority=2,
+               required={
+                   "employee_id": EMPLOYEE_ID_PROMPT,
+                   "leave_dates": "I couldn't identify any dates in your request. Please specify dates in YYYY-MM-DD format."
+               },
+               error="Error processing leave application")
+@mcp.tool(invalidates="employee_id")
 def apply_leave(employee_id: str, leave_dates: List[str]) -> str:
     """
     Apply leave for specific dates (e.g., ["2025-04-17", "2025-05-01"])
     """
-    if employee_id not in employee_leaves:
+    try:
+        # Deduct balance and add to history in one transaction
+        outcome = store.apply_leave(employee_id, leave_dates)
+    except (EmployeeNotFound, InvalidLeaveDate, DuplicateLeave, InsufficientBalance) as e:
+        outcome = e
+    return _leave_result(leave_dates, outcome)
+
+@mcp.bulk("apply_leave")
+def apply_leave_batch(calls: List[Dict[str, Any]]) -> List[str]:
+    """Apply many leave requests in one store transaction (used by execute_batch)"""
+    outcomes = store.apply_leave_many([(call["employee_id"], call["leave_dates"]) for call in calls])
+    return [_leave_result(call["leave_dates"], outcome) for call, outcome in zip(calls, outcomes)]
+
+def _leave_result(leave_dates: List[str], outcome) -> str:
+    """Describe an apply_leave outcome: the remaining balance or the store error"""
+    if isinstance(outcome, EmployeeNotFound):
         return "Employee ID not found."
-    requested_days = len(leave_dates)
-    available_balance = employee_leaves[employee_id]["balance"]
-    if available_balance < requested_days:
-        return f"Insufficient leave balance. You requested {requested_days} day(s) but have only {available_balance}."
-    # Deduct balance and add to history
-    employee_leaves[employee_id]["balance"] -= requested_days
-    employee_leaves[employee_id]["history"].extend(leave_dates)
-    return f"Leave applied for {requested_days} day(s). Remaining balance: {employee_leaves[employee_id]['balance']}."
+    if isinstance(outcome, InvalidLeaveDate):
+        return f"Invalid leave date '{outcome.day}'. Please use YYYY-MM-DD format."
+    if isinstance(outcome, DuplicateLeave):
+        return f"Leave is already recorded for {', '.join(outcome.days)}."
+    if isinstance(outcome, InsufficientBalance):
+        return f"Insufficient leave balance. You requested {outcome.requested} day(s) but have only {outcome.available}."
+    # Repeated dates are only charged once
+    return f"Leave applied for {len(set(leave_dates))} day(s). Remaining balance: {outcome}."
 
 # Resource: Leave history
-@mcp.tool()
-def get_leave_history(employee_id: str) -> str:
-    """Get leave history for the employee"""
-    data = employee_leaves.get(employee_id)
-    if data:
-        history = ', '.join(data['history']) if data['history'] else "No leaves taken."
-        return f"Leave history for {employee_id}: {history}"
-    return "Employee ID not found."
+@router.intent("leave_history", any_of=["history"], priority=1,
+               required={"employee_id": EMPLOYEE_ID_PROMPT})
+@mcp.tool(cache=True, cache_tag="employee_id")
+def get_leave_history(employee_id: str, start_date: str = "", end_date: str = "",
+                      page: int = 1, page_size: int = HISTORY_PAGE_SIZE) -> str:
+    """Get leave history for the employee, optionally between two YYYY-MM-DD dates, one page at a time"""
+    if page_size < 1:
+        return f"Invalid page size {page_size}. Please use a page size of 1 or more."
+    try:
+        total = store.count_history(employee_id, start_date or None, end_date or None)
+        # Only the requested page is read from the index
+        page = max(1, page)
+        days = store.get_history(employee_id, start_date or None, end_date or None,
+                                 limit=page_size, offset=(page - 1) * page_size)
+    except InvalidLeaveDate as e:
+        return f"Invalid date '{e.day}'. Please use YYYY-MM-DD format."
+    if days is None:
+        return "Employee ID not found."
+    history = ', '.join(days) if days else "No leaves taken."
+    if start_date and end_date:
+        history = f"{history} (between {start_date} and {end_date})"
+    elif start_date:
+        history = f"{history} (from {start_date})"
+    elif end_date:
+        history = f"{history} (until {end_date})"
+    pages = (total + page_size - 1) // page_size
+    if pages > 1:
+        history = f"{history} (page {page} of {pages})"
+    return f"Leave history for {employee_id}: {history}"
 
 # Resource: Greeting
-@mcp.resource("greeting://{name}")
+@router.intent("greeting", any_of=["hello", "hi"], priority=3, defaults={"name": "there"})
+@mcp.resource("greeting://{name}", cache=True)
 def get_greeting(name: str) -> str:
     """Get a personalized greeting"""
     return f"Hello, {name}! How can I assist you with leave management today?"
 
+# Voice transcripts and typed commands share one background pipeline
+class CommandPipeline:
+    """Routes voice transcripts and typed commands off the caller's thread
+
+    Responses are posted to message_queue in the order the commands were
+    submitted, however long each one takes. Typed commands start routing as
+    soon as they are submitted, so several can be in flight at once;
+    utterances are routed once their transcript is ready.
+    """
+
+    def __init__(self):
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self.deliver, daemon=True)
+        self.thread.start()
+
+    def submit_text(self, text: str):
+        """Queue a typed command and show it immediately with a pending note"""
+        message_queue.put(Message("user", text))
+        message_queue.put(Message("system", "Processing command...", status=True))
+        self.pending.put((False, process_voice_command(text), None))
+
+    def submit_audio(self, decode_future: Future, speculation=None):
+        """Queue an utterance whose transcript is still being decoded
+
+        speculation (an intents.Speculation) is committed or discarded once
+        the final transcript is routed.
+        """
+        self.pending.put((True, decode_future, speculation))
+
+    def close(self, wait: bool = False):
+        """Stop after everything already submitted; wait=True blocks until it is delivered"""
+        self.pending.put(None)
+        if wait:
+            self.thread.join()
+
+    def deliver(self):
+        """Thread function that waits on futures in submission order and posts the responses"""
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            is_audio, future, speculation = item
+            try:
+                if is_audio:
+                    text = future.result()
+                    if not text and speculation is not None:
+                        speculation.discard()
+                    if text is None:
+                        # Not addressed to us (see wakeword.WakeWordGate)
+                        continue
+                    if not text:
+                        message_queue.put(Message("system", "Yes? What would you like to do?"))
+                        continue
+
+                    # Put recognized text in queue
+                    message_queue.put(Message("user", text))
+
+                    # Process the command through MCP
+                    future = process_voice_command(text, speculation)
+
+                response = future.result()
+
+                # Put MCP response in queue
+                message_queue.put(Message("mcp", response))
+            except CancelledError:
+                if speculation is not None:
+                    speculation.discard()
+            except Exception as e:
+                if speculation is not None:
+                    speculation.discard()
+                message_queue.put(Message("system", describe_error(e)))
+
+class PartialTranscripts:
+    """Decodes the audio of an utterance in progress and feeds each hypothesis to a Speculation"""
+
+    def __init__(self, pool, speculation):
+        self.pool = pool
+        self.speculation = speculation
+        self.decoding: Optional[Future] = None
+
+    def __call__(self, audio):
+        # One partial decode at a time, so partials never pile up ahead of final transcripts
+        if self.decoding is not None and not self.decoding.done():
+            return
+        self.decoding = self.pool.submit(audio)
+        self.decoding.add_done_callback(self.decoded)
+
+    def decoded(self, future: Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.speculation.update(future.result())
+
+def describe_error(e: Exception) -> str:
+    """System message for a failed command; speech recognition errors get friendlier text"""
+    # Only an already imported speech_recognition can have raised its errors
+    sr = sys.modules.get("speech_recognition")
+    if sr is not None:
+        if isinstance(e, sr.UnknownValueError):
+            return "Sorry, I couldn't understand what you said."
+        if isinstance(e, sr.RequestError):
+            return f"Speech recognition service error: {e}"
+    return f"Error: {str(e)}"
+
 # Voice recognition function
-def voice_recognizer(stop_event, recognizer_active):
-    """Thread function to handle voice recognition"""
-    # Initialize recognizer
-    r = sr.Recognizer()
-    r.energy_threshold = 300  # Adjust based on environment
-    r.pause_threshold = 1.0
+def voice_recognizer(stop_event, recognizer_active, source_factory=None,
+                     backend="google", backend_options=None, workers=2, vad_options=None,
+                     pipeline=None, wake_gate=None, partial_interval=None):
+    """Thread function to handle voice recognition
+
+    Transcripts go through pipeline (a CommandPipeline shared with typed
+    commands) or, when none is given, a private one closed on exit. The
+    audio source defaults to the microphone. With a wakeword.WakeWordGate
+    only addressed utterances reach the recognizer pool.
+
+    With partial_interval (seconds), the audio of an utterance in progress
+    is decoded that often and read-only tool calls are prefetched from the
+    partial transcript, to be committed or discarded by the final one.
+    """
+    import speech_recognition as sr
+    from audio import AudioCapture, EndOfStream
+    from recognizers import RecognitionPool
+
+    if source_factory is None:
+        source_factory = sr.Microphone
+    # The microphone stays open for the whole session once listening starts;
+    # vad_options tune segmentation (e.g. hangover=0.6 seconds of end-of-speech silence)
+    capture = AudioCapture(source_factory, **(vad_options or {}))
+    capture_open = False
+    was_active = False
+    # Decoding runs in worker processes so capture never waits on the recognizer
+    pool = RecognitionPool(backend, workers=workers, **(backend_options or {}))
+    if wake_gate is not None:
+        wake_gate.start(pool)
+    own_pipeline = pipeline is None
+    if own_pipeline:
+        pipeline = CommandPipeline()
 
     # Put initial message in queue
-    message_queue.put({
-        "source": "system",
-        "content": "Voice recognition system initialized. Say something to get started."
-    })
-
-    while not stop_event.is_set():
-        # Only listen when recognition is active
-        if recognizer_active.is_set():
-            try:
-                with sr.Microphone() as source:
-                    message_queue.put({
-                        "source": "system",
-                        "content": "Listening..."
-                    })
-                    
-                    # Adjust for ambient noise
-                    r.adjust_for_ambient_noise(source, duration=0.5)
-                    
-                    # Listen for input
-                    audio = r.listen(source, timeout=5, phrase_time_limit=10)
-                    
-                    message_queue.put({
-                        "source": "system",
-                        "content": "Processing speech..."
-                    })
+    message_queue.put(Message("system", "Voice recognition system initialized. Say something to get started."))
+
+    try:
+        while not stop_event.is_set():
+            # Only listen when recognition is active
+            if recognizer_active.is_set():
+                try:
+                    if not capture_open:
+                        with metrics.span("mic_open"):
+                            capture.start()
+                        capture_open = True
+                        # Calibrate for ambient noise once; it is tracked in the background after this
+                        with metrics.span("calibrate"):
+                            capture.calibrate(duration=0.5)
+                    elif not was_active:
+                        # Drop audio buffered while recognition was off
+                        capture.discard_pending()
+                    was_active = True
+
+                    message_queue.put(Message("system", "Listening...", status=True))
                     
-                    # Use Google's speech recognition
-                    text = r.recognize_google(audio)
+                    # Speculate only on speech that will reach the recognizer
+                    speculation = None
+                    if partial_interval and (wake_gate is None or wake_gate.is_awake()):
+                        speculation = router.speculate()
                     
-                    # Put recognized text in queue
-                    message_queue.put({
-                        "source": "user",
-                        "content": text
-                    })
+                    # Listen for input; the VAD drops noise before it reaches the recognizer
+                    try:
+                        with metrics.span("listen"):
+                            utterance = capture.next_utterance(
+                                timeout=5, phrase_time_limit=10,
+                                on_partial=PartialTranscripts(pool, speculation) if speculation else None,
+                                partial_interval=partial_interval or 0.5)
+                    except BaseException:
+                        if speculation is not None:
+                            speculation.discard()
+                        raise
                     
-                    # Process the command through MCP
-                    response = process_voice_command(text)
+                    if wake_gate is not None:
+                        # Chatter that was not addressed to us is dropped silently by the gate
+                        pipeline.submit_audio(metrics.time_future("recognize", wake_gate.submit(utterance)),
+                                              speculation)
+                        continue
                     
-                    # Put MCP response in queue
-                    message_queue.put({
-                        "source": "mcp",
-                        "content": response
-                    })
+                    message_queue.put(Message("system", "Processing speech...", status=True,
+                                              timing=utterance.timing()))
                     
-            except sr.WaitTimeoutError:
-                message_queue.put({
-                    "source": "system",
-                    "content": "Listening timed out. Please try again."
-                })
-            except sr.UnknownValueError:
-                message_queue.put({
-                    "source": "system", 
-                    "content": "Sorry, I couldn't understand what you said."
-                })
-            except sr.RequestError as e:
-                message_queue.put({
-                    "source": "system",
-                    "content": f"Speech recognition service error: {e}"
-                })
-            except Exception as e:
-                message_queue.put({
-                    "source": "system",
-                    "content": f"Error: {str(e)}"
-                })
-        else:
-            # Sleep to prevent CPU hogging when not listening
-            time.sleep(0.5)
-
-def process_voice_command(command):
-    """Process voice commands and route to appropriate MCP functions"""
-    command = command.lower()
-    
-    # Handle check balance commands
-    if "balance" in command or "how many days" in command:
-        # Extract employee ID - assuming format like "check balance for E001"
-        for emp_id in employee_leaves.keys():
-            if emp_id.lower() in command:
-                return mcp.execute_tool("get_leave_balance", employee_id=emp_id)
-        return "Please specify a valid employee ID like E001 or E002."
-    
-    # Handle leave history commands
-    elif "history" in command:
-        for emp_id in employee_leaves.keys():
-            if emp_id.lower() in command:
-                return mcp.execute_tool("get_leave_history", employee_id=emp_id)
-        return "Please specify a valid employee ID like E001 or E002."
-    
-    # Handle leave application - this is more complex and might require a conversation
-    elif "apply" in command and "leave" in command:
-        try:
-            # Extract employee ID
-            emp_id = None
-            for e_id in employee_leaves.keys():
-                if e_id.lower() in command:
-                    emp_id = e_id
+                    # Hand the utterance to the recognizer pool and keep listening
+                    pipeline.submit_audio(metrics.time_future("recognize", pool.submit(utterance.audio)),
+                                          speculation)
+                        
+                except sr.WaitTimeoutError:
+                    message_queue.put(Message("system", "Listening timed out. Please try again.", status=True))
+                except EndOfStream:
+                    message_queue.put(Message("system", "Audio input ended."))
                     break
-            
-            if not emp_id:
-                return "Please specify a valid employee ID like E001 or E002."
-            
-            # Try to extract dates - assuming format like "2025-04-17"
-            import re
-            dates = re.findall(r'\d{4}-\d{2}-\d{2}', command)
-            
-            if not dates:
-                return "I couldn't identify any dates in your request. Please specify dates in YYYY-MM-DD format."
-            
-            return mcp.execute_tool("apply_leave", employee_id=emp_id, leave_dates=dates)
-        except Exception as e:
-            return f"Error processing leave application: {str(e)}"
-    
-    # Handle greeting
-    elif "hello" in command or "hi" in command:
-        # Try to extract name
-        name = "there"  # Default
-        name_indicators = ["my name is", "i am", "call me"]
-        for indicator in name_indicators:
-            if indicator in command:
-                name = command.split(indicator)[1].strip().split()[0]  # Get first word after indicator
-                break
-        
-        return mcp.execute_resource("greeting", name=name)
-    
-    # Handle help
-    elif "help" in command:
-        return """
+                except Exception as e:
+                    message_queue.put(Message("system", f"Error: {str(e)}"))
+            else:
+                was_active = False
+                # Sleep to prevent CPU hogging when not listening
+                time.sleep(0.5)
+    finally:
+        if capture_open:
+            capture.stop()
+        # When input ends on its own, let queued utterances finish decoding
+        if wake_gate is not None:
+            wake_gate.close(wait=not stop_event.is_set())
+        pool.shutdown(wait=not stop_event.is_set())
+        if own_pipeline:
+            pipeline.close(wait=not stop_event.is_set())
+
+# Help
+@router.intent("help", any_of=["help"], priority=4)
+def help_text() -> str:
+    """List the commands the router understands"""
+    return """
         Available commands:
         - Check balance for [employee ID]
         - Get leave history for [employee ID]
         - Apply leave for [employee ID] on [date]
         - Hello/Hi
         """
-    
-    else:
-        return "I'm not sure how to handle that request. Try asking for help to see available commands."
+
+def process_voice_command(command, speculation=None) -> Future:
+    """Route a voice or text command on the MCP tool loop without blocking the caller
+
+    Returns a future for the response text; tool errors surface through it.
+    speculation holds read-only calls prefetched from partial transcripts.
+    """
+    return metrics.time_future("command", mcp.submit(router.route_async(command, speculation)))
 
 class VoiceMCPApp:
-    def __init__(self, root):
+    def __init__(self, root, recognizer="google", recognizer_options=None, retention=500,
+                 wake_gate=None, partial_interval=None):
+        _import_tk()
         self.root = root
+        self.retention = retention
+        self.wake_gate = wake_gate
         self.root.title("Voice-Controlled MCP Leave Manager")
         self.root.geometry("800x600")
         
@@ -291,16 +938,24 @@ class VoiceMCPApp:
         # Create UI elements
         self.create_widgets()
         
+        # Typed commands and voice transcripts share one background pipeline
+        self.pipeline = CommandPipeline()
+        
         # Start voice recognition thread
         self.voice_thread = threading.Thread(
             target=voice_recognizer, 
             args=(self.stop_event, self.recognizer_active),
+            kwargs={"backend": recognizer, "backend_options": recognizer_options,
+                    "pipeline": self.pipeline, "wake_gate": wake_gate,
+                    "partial_interval": partial_interval},
             daemon=True
         )
         self.voice_thread.start()
         
-        # Start message processing
-        self.process_messages()
+        # Producers wake the Tk loop only when messages arrive. event_generate from another
+        # thread fails until mainloop runs, so the notifier is installed from inside it
+        self.root.bind("<<MessagesQueued>>", self.process_messages)
+        self.root.after(0, self.attach_message_queue)
         
     def create_widgets(self):
         # Create frame for conversation display
@@ -315,6 +970,16 @@ class VoiceMCPApp:
         )
         self.conversation.pack(fill=tk.BOTH, expand=True)
         self.conversation.config(state=tk.DISABLED)
+        # Only the latest messages stay in the widget; older ones page in from disk on scroll-back
+        self.view = ConversationView(
+            self.conversation, self.render_message,
+            tags={
+                "user_tag": {"foreground": "#2196F3", "font": ("Arial", 12, "bold")},
+                "mcp_tag": {"foreground": "#4CAF50", "font": ("Arial", 12, "bold")},
+                "system_tag": {"foreground": "#9E9E9E", "font": ("Arial", 12, "italic")},
+            },
+            scrollbar=self.conversation.vbar, retention=self.retention
+        )
         
         # Create frame for control buttons
         control_frame = tk.Frame(self.root)
@@ -373,6 +1038,19 @@ class VoiceMCPApp:
         )
         help_button.pack(side=tk.RIGHT, padx=5)
         
+        # Stats button: latency histograms per pipeline stage
+        stats_button = tk.Button(
+            control_frame,
+            text="Stats",
+            command=self.show_stats,
+            bg="#607D8B",
+            fg="white",
+            font=("Arial", 12),
+            width=10,
+            height=2
+        )
+        stats_button.pack(side=tk.RIGHT, padx=5)
+        
     def toggle_recognition(self):
         if self.recognizer_active.is_set():
             self.recognizer_active.clear()
@@ -385,43 +1063,36 @@ class VoiceMCPApp:
             self.status_label.config(text="Voice Recognition: ON", fg="#4CAF50")
             self.add_message("System", "Voice recognition activated.")
             
+    # Label and tag for each message_queue source
+    PREFIXES = {"user": ("You: ", "user_tag"), "mcp": ("MCP: ", "mcp_tag"), "system": ("System: ", "system_tag")}
+
+    @classmethod
+    def render_message(cls, message):
+        """Text segments for a message_queue entry"""
+        prefix, tag = cls.PREFIXES.get(message["source"], cls.PREFIXES["system"])
+        return [(prefix, tag), (f"{message['content']}\n\n", "")]
+
     def add_message(self, sender, message):
-        self.conversation.config(state=tk.NORMAL)
-        
-        # Format based on sender
-        if sender == "User":
-            self.conversation.insert(tk.END, f"You: ", "user_tag")
-            self.conversation.tag_config("user_tag", foreground="#2196F3", font=("Arial", 12, "bold"))
-        elif sender == "MCP":
-            self.conversation.insert(tk.END, f"MCP: ", "mcp_tag")
-            self.conversation.tag_config("mcp_tag", foreground="#4CAF50", font=("Arial", 12, "bold"))
-        else:  # System
-            self.conversation.insert(tk.END, f"System: ", "system_tag")
-            self.conversation.tag_config("system_tag", foreground="#9E9E9E", font=("Arial", 12, "italic"))
-        
-        # Insert the message and scroll to see it
-        self.conversation.insert(tk.END, f"{message}\n\n")
-        self.conversation.see(tk.END)
-        self.conversation.config(state=tk.DISABLED)
+        self.view.append([{"source": sender.lower(), "content": message}])
+
+    def attach_message_queue(self):
+        """Runs on the Tk loop: start receiving wakeups and drain anything already queued"""
+        message_queue.notifier = self.notify_messages
+        self.process_messages()
+
+    def notify_messages(self):
+        """Called on producer threads: wake the Tk loop to drain the queue"""
+        self.root.event_generate("<<MessagesQueued>>", when="tail")
             
-    def process_messages(self):
-        """Process messages from the queue and update UI"""
+    def process_messages(self, event=None):
+        """Drain every queued message and update the UI once"""
         try:
-            while not message_queue.empty():
-                message = message_queue.get_nowait()
-                
-                if message["source"] == "user":
-                    self.add_message("User", message["content"])
-                elif message["source"] == "mcp":
-                    self.add_message("MCP", message["content"])
-                elif message["source"] == "system":
-                    self.add_message("System", message["content"])
+            messages = message_queue.drain()
+            with metrics.span("render"):
+                self.view.append([m.as_dict() for m in messages if m.source in self.PREFIXES])
         except Exception as e:
             print(f"Error processing message: {e}")
             
-        # Schedule next check
-        self.root.after(100, self.process_messages)
-        
     def send_text_command(self, event=None):
         """Process text commands from the input field"""
         command = self.text_input.get().strip()
@@ -429,20 +1100,8 @@ class VoiceMCPApp:
             # Clear input field
             self.text_input.delete(0, tk.END)
             
-            # Put command in queue
-            message_queue.put({
-                "source": "user",
-                "content": command
-            })
-            
-            # Process command
-            response = process_voice_command(command)
-            
-            # Put response in queue
-            message_queue.put({
-                "source": "mcp",
-                "content": response
-            })
+            # Routed in the background; the response arrives through the queue in order
+            self.pipeline.submit_text(command)
             
     def show_help(self):
         """Show help information"""
@@ -463,22 +1122,119 @@ Tips:
 - You can also type commands in the text box below
         """
         
-        message_queue.put({
-            "source": "system",
-            "content": help_text
-        })
+        message_queue.put(Message("system", help_text))
+        
+    def show_stats(self):
+        """Show per-stage latency percentiles, wake-word gate and speculation counters"""
+        content = metrics.summary_text()
+        bus = message_queue.stats()
+        content += (f"\nMessage bus ({bus['policy']}): {bus['queued']}/{bus['maxsize']} queued, "
+                    f"high water {bus['high_water']}, dropped {bus['dropped']}, "
+                    f"coalesced {bus['coalesced']}, blocked {bus['blocked']}; "
+                    f"coalesced tool calls {mcp.coalesced}")
+        speculation = router.speculation_stats()
+        if speculation["prefetched"]:
+            content += "\nSpeculative prefetch: " + ", ".join(f"{k}: {v}" for k, v in speculation.items())
+        if self.wake_gate is not None:
+            counters = ", ".join(f"{name.replace('_', ' ')}: {value}"
+                                 for name, value in self.wake_gate.stats().items())
+            content += f"\nWake word: {counters}"
+        message_queue.put(Message("system", content))
         
     def on_closing(self):
         """Handle window close event"""
         self.stop_event.set()  # Signal threads to stop
+        message_queue.notifier = None
+        mcp.cancel_all()
+        self.pipeline.close()
+        self.view.close()
         self.root.destroy()
 
 if __name__ == "__main__":
-    # Run the MCP server
-    mcp.run()
+    import argparse
+    parser = argparse.ArgumentParser(description="Voice-controlled MCP leave manager")
+    parser.add_argument("--transport", choices=["stdio", "tcp", "websocket", "none"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--headless", action="store_true",
+                        help="only serve MCP tools: no GUI, microphone or speech recognition")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="with --headless: serve through N worker processes, each owning a shard of employees")
+    parser.add_argument("--recognizer", default="google",
+                        help="speech recognition backend: google, sphinx or vosk (offline), or stub")
+    parser.add_argument("--vosk-model", default="model", help="path to a Vosk model directory")
+    parser.add_argument("--wake-word", help='only recognize speech addressed with this phrase, e.g. "leave manager"')
+    parser.add_argument("--wake-sensitivity", type=float, default=0.85,
+                        help="sphinx keyword sensitivity from 0 to 1 (higher wakes more easily)")
+    parser.add_argument("--wake-backend", default="sphinx",
+                        help="keyword spotter for --wake-word: sphinx, vosk (with --vosk-model) or stub")
+    parser.add_argument("--follow-up", type=float, default=8.0,
+                        help="seconds after an addressed utterance during which no wake word is needed")
+    parser.add_argument("--partials", type=float, metavar="SECONDS",
+                        help="decode partial transcripts this often and prefetch read-only results while speaking")
+    parser.add_argument("--retention", type=int, default=500,
+                        help="messages kept in the conversation view; older ones page in on scroll-back")
+    parser.add_argument("--transcript", help="append the session transcript to this file (replay with transcript.py)")
+    parser.add_argument("--metrics", action="store_true", help="record per-stage latency histograms")
+    parser.add_argument("--metrics-port", type=int, help="serve /metrics on this port (implies --metrics)")
+    args = parser.parse_args()
+    if args.headless and args.transport == "none":
+        parser.error("--headless needs a transport")
+    if args.workers and not args.headless:
+        parser.error("--workers needs --headless")
+    if not 0.0 <= args.wake_sensitivity <= 1.0:
+        parser.error("--wake-sensitivity must be between 0 and 1")
+    if not args.workers:
+        try:
+            require_single(DATABASE, LAYOUT)
+        except LayoutError as e:
+            parser.error(str(e))
+    
+    if args.transcript:
+        message_queue.transcript = TranscriptWriter(args.transcript)
+    if args.metrics or args.metrics_port:
+        metrics.enabled = True
+    if args.metrics_port:
+        metrics.serve(args.host, args.metrics_port)
     
-    # Start the GUI application
-    root = tk.Tk()
-    app = VoiceMCPApp(root)
-    root.protocol("WM_DELETE_WINDOW", app.on_closing)
-    root.mainloop()
\ No newline at end of file
+    try:
+        if args.headless and args.workers:
+            asyncio.run(serve_sharded(args.workers, args.transport, args.host, args.port,
+                                      database=DATABASE, name=mcp.name, layout=LAYOUT))
+        elif args.headless:
+            mcp.run(transport=args.transport, host=args.host, port=args.port)
+        else:
+            from recognizers import BACKENDS
+            if args.recognizer not in BACKENDS:
+                parser.error(f"unknown recognizer '{args.recognizer}' (choose from {', '.join(sorted(BACKENDS))})")
+            recognizer_options = {"model_path": args.vosk_model} if args.recognizer == "vosk" else {}
+            wake_gate = None
+            if args.wake_word:
+                from wakeword import WakeWordGate, default_spotter_options
+                spotter_options = default_spotter_options(args.wake_backend, args.wake_word,
+                                                          args.wake_sensitivity)
+                if args.wake_backend == "vosk":
+                    spotter_options["model_path"] = args.vosk_model
+                wake_gate = WakeWordGate(args.wake_word, spotter=args.wake_backend,
+                                         spotter_options=spotter_options, follow_up=args.follow_up)
+            
+            # Run the MCP server alongside the GUI
+            if args.transport != "none":
+                threading.Thread(
+                    target=mcp.run,
+                    kwargs={"transport": args.transport, "host": args.host, "port": args.port},
+                    daemon=True
+                ).start()
+            
+            # Start the GUI application
+            _import_tk()
+            root = tk.Tk()
+            app = VoiceMCPApp(root, recognizer=args.recognizer, recognizer_options=recognizer_options,
+                              retention=args.retention, wake_gate=wake_gate, partial_interval=args.partials)
+            root.protocol("WM_DELETE_WINDOW", app.on_closing)
+            root.mainloop()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if message_queue.transcript is not None:
+            message_queue.transcript.close()
@@ -0,0 +1,360 @@
+"""
+Durable leave storage backed by SQLite in WAL mode.
+
+Every balance change runs in its own write transaction (BEGIN IMMEDIATE), so
+the check-and-deduct in apply_leave is atomic even when the voice thread,
+the text path and MCP clients call it at the same time. WAL lets readers
+proceed while a writer commits. Connections come from a fixed-size pool
+sized for the number of concurrent tool calls.
+
+With synchronous=NORMAL (the default) committed leaves survive process
+crashes and restarts; use synchronous="FULL" to also survive power loss.
+
+Several processes may share one database file (e.g. gateway.py and
+server.py). Each write transaction bumps a shared sequence number, so a
+process can tell its own commits from other processes' and drop results
+it cached from before someone else's write (changed_elsewhere).
+"""
+import queue
+import sqlite3
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+SCHEMA_VERSION = 3
+
+# Leave days are stored as proleptic Gregorian ordinals in a clustered
+# (employee_id, day) key: history is kept sorted, range queries and duplicate
+# checks are index seeks, and each day costs a few bytes.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    id TEXT PRIMARY KEY,
+    balance INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leave_days (
+    employee_id TEXT NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+    day INTEGER NOT NULL,
+    PRIMARY KEY (employee_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS writes (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    seq INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO writes (id, seq) VALUES (0, 0);
+"""
+
+# Version 1 kept history as an unsorted list of date strings
+MIGRATE_FROM_V1 = """
+INSERT OR IGNORE INTO leave_days (employee_id, day)
+    SELECT employee_id, CAST(julianday(day) - 1721424.5 AS INTEGER) FROM leave_history
+    WHERE julianday(day) IS NOT NULL;
+DROP TABLE leave_history;
+"""
+
+def shard_of(employee_id: str, shards: int) -> int:
+    """Shard owning an employee in worker mode; stable across processes, unlike hash()"""
+    return zlib.crc32(employee_id.encode()) % shards
+
+def to_ordinal(day: str) -> int:
+    """Parse a YYYY-MM-DD date into its ordinal day number"""
+    try:
+        return date.fromisoformat(day).toordinal()
+    except (TypeError, ValueError):
+        raise InvalidLeaveDate(day)
+
+def from_ordinal(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+class EmployeeNotFound(KeyError):
+    """The employee id is not in the store"""
+
+class InsufficientBalance(Exception):
+    """A leave request exceeds the employee's remaining balance"""
+    def __init__(self, requested: int, available: int):
+        super().__init__(f"requested {requested} day(s) but only {available} available")
+        self.requested = requested
+        self.available = available
+
+class InvalidLeaveDate(ValueError):
+    """A leave date is not a valid YYYY-MM-DD date"""
+    def __init__(self, day):
+        super().__init__(f"invalid date {day!r}, expected YYYY-MM-DD")
+        self.day = day
+
+class DuplicateLeave(Exception):
+    """Some requested days are already recorded as leave"""
+    def __init__(self, days: List[str]):
+        super().__init__(f"leave already recorded for {', '.join(days)}")
+        self.days = days
+
+class LeaveStore:
+    """Employee balances and leave history with a pooled SQLite connection per caller"""
+
+    def __init__(self, path: str = "leaves.db", pool_size: int = 8, synchronous: str = "NORMAL"):
+        if path == ":memory:":
+            # A private shared-cache database so every pooled connection sees the same data
+            path = f"file:leaves-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.path = path
+        self.synchronous = synchronous
+        self.pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self.pool_size = pool_size
+        # Keep one connection open for the lifetime of the store (required for memory databases)
+        self.keepalive = self._connect()
+        self._migrate(self.keepalive)
+        # Cross-process change tracking on the keepalive connection: the last write
+        # sequence accounted for, and own commits numbered past it (see changed_elsewhere)
+        self.watch_lock = threading.Lock()
+        self.data_version = self.keepalive.execute("PRAGMA data_version").fetchone()[0]
+        self.seen = self._write_seq(self.keepalive)
+        self.own_writes: set = set()
+        for _ in range(pool_size):
+            self.pool.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, uri=self.path.startswith("file:"), timeout=30.0,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Create the schema and upgrade databases from the string-history layout"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            legacy = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leave_history'").fetchone()
+            if legacy:
+                for statement in MIGRATE_FROM_V1.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection (blocks while all are in use)"""
+        conn = self.pool.get()
+        try:
+            yield conn
+        finally:
+            self.pool.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """A write transaction that takes the write lock up front"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("UPDATE writes SET seq = seq + 1 WHERE id = 0")
+                seq = self._write_seq(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        self._own_write(seq)
+
+    @staticmethod
+    def _write_seq(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT seq FROM writes WHERE id = 0").fetchone()[0]
+
+    def _own_write(self, seq: int):
+        with self.watch_lock:
+            if seq != self.seen + 1:
+                if seq > self.seen:
+                    self.own_writes.add(seq)
+                return
+            self.seen = seq
+            # Absorb own commits that were waiting behind this one
+            while self.seen + 1 in self.own_writes:
+                self.seen += 1
+                self.own_writes.discard(self.seen)
+
+    def changed_elsewhere(self) -> bool:
+        """Whether another process committed since the last call
+
+        PRAGMA data_version makes the common case (nothing committed at all)
+        a cheap check; otherwise the write sequence shows whether every
+        commit since the last call was this store's own.
+        """
+        with self.watch_lock:
+            data_version = self.keepalive.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self.data_version:
+                return False
+            self.data_version = data_version
+            seq = self._write_seq(self.keepalive)
+            foreign = any(n not in self.own_writes for n in range(self.seen + 1, seq + 1))
+            self.own_writes = {n for n in self.own_writes if n > seq}
+            self.seen = max(self.seen, seq)
+            return foreign
+
+    def is_empty(self) -> bool:
+        with self.connection() as conn:
+            return conn.execute("SELECT 1 FROM employees LIMIT 1").fetchone() is None
+
+    def employee_ids(self) -> List[str]:
+        with self.connection() as conn:
+            return [row[0] for row in conn.execute("SELECT id FROM employees")]
+
+    def __contains__(self, employee_id: str) -> bool:
+        with self.connection() as conn:
+            return conn.execute("SELECT 1 FROM employees WHERE id = ?", (employee_id,)).fetchone() is not None
+
+    def get_balance(self, employee_id: str) -> Optional[int]:
+        with self.connection() as conn:
+            row = conn.execute("SELECT balance FROM employees WHERE id = ?", (employee_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_history(self, employee_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                    after: Optional[str] = None, limit: Optional[int] = None,
+                    offset: int = 0) -> Optional[List[str]]:
+        """Leave days in date order, optionally within [start, end]
+
+        Pages can be read by offset or, in O(log n) per page, by passing the
+        last day of the previous page as the after cursor.
+        """
+        low = to_ordinal(start) if start else 0
+        if after:
+            low = max(low, to_ordinal(after) + 1)
+        high = to_ordinal(end) if end else 2 ** 62
+        with self.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                if conn.execute("SELECT 1 FROM employees WHERE id = ?", (employee_id,)).fetchone() is None:
+                    return None
+                rows = conn.execute(
+                    "SELECT day FROM leave_days WHERE employee_id = ? AND day BETWEEN ? AND ? "
+                    "ORDER BY day LIMIT ? OFFSET ?",
+                    (employee_id, low, high, -1 if limit is None else limit, offset))
+                return [from_ordinal(row[0]) for row in rows]
+            finally:
+                conn.execute("COMMIT")
+
+    def count_history(self, employee_id: str, start: Optional[str] = None,
+                      end: Optional[str] = None) -> int:
+        """Number of leave days within [start, end], counted on the index"""
+        low = to_ordinal(start) if start else 0
+        high = to_ordinal(end) if end else 2 ** 62
+        with self.connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM leave_days WHERE employee_id = ? AND day BETWEEN ? AND ?",
+                (employee_id, low, high)).fetchone()[0]
+
+    def apply_leave(self, employee_id: str, leave_dates: List[str]) -> int:
+        """Atomically deduct and record leave; returns the remaining balance
+
+        Days repeated within the request count once. Days already on record
+        reject the whole request with DuplicateLeave.
+        """
+        days = sorted({to_ordinal(day) for day in leave_dates})
+        requested = len(days)
+        with self.transaction() as conn:
+            row = conn.execute("SELECT balance FROM employees WHERE id = ?", (employee_id,)).fetchone()
+            if row is None:
+                raise EmployeeNotFound(employee_id)
+            # One primary-key seek per requested day
+            taken = [day for day in days if conn.execute(
+                "SELECT 1 FROM leave_days WHERE employee_id = ? AND day = ?", (employee_id, day)).fetchone()]
+            if taken:
+                raise DuplicateLeave([from_ordinal(day) for day in taken])
+            if row[0] < requested:
+                raise InsufficientBalance(requested, row[0])
+            conn.execute("UPDATE employees SET balance = balance - ? WHERE id = ?", (requested, employee_id))
+            conn.executemany("INSERT INTO leave_days (employee_id, day) VALUES (?, ?)",
+                             [(employee_id, day) for day in days])
+        return row[0] - requested
+
+    def apply_leave_many(self, requests: List[Tuple[str, List[str]]]) -> List[Union[int, Exception]]:
+        """Apply many leave requests in one transaction, validating all balances in one pass
+
+        Results are in request order: the remaining balance, or the exception
+        (EmployeeNotFound, InvalidLeaveDate, DuplicateLeave, InsufficientBalance)
+        that rejected the request. Requests for the same employee are applied
+        in order against a running balance, so each employee's outcome is the
+        same as applying them one by one.
+        """
+        results: List[Union[int, Exception]] = [None] * len(requests)
+        parsed = []
+        for index, (employee_id, leave_dates) in enumerate(requests):
+            try:
+                parsed.append((index, employee_id, sorted({to_ordinal(day) for day in leave_dates})))
+            except InvalidLeaveDate as e:
+                results[index] = e
+        employee_ids = list({employee_id for _, employee_id, _ in parsed})
+        with self.transaction() as conn:
+            balances: Dict[str, int] = {}
+            for start in range(0, len(employee_ids), 500):
+                chunk = employee_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                balances.update(conn.execute(
+                    f"SELECT id, balance FROM employees WHERE id IN ({placeholders})", chunk))
+            original = dict(balances)
+            new_days: Dict[str, set] = {}
+            for index, employee_id, days in parsed:
+                if employee_id not in balances:
+                    results[index] = EmployeeNotFound(employee_id)
+                    continue
+                pending = new_days.setdefault(employee_id, set())
+                taken = [day for day in days if day in pending or conn.execute(
+                    "SELECT 1 FROM leave_days WHERE employee_id = ? AND day = ?", (employee_id, day)).fetchone()]
+                if taken:
+                    results[index] = DuplicateLeave([from_ordinal(day) for day in taken])
+                elif balances[employee_id] < len(days):
+                    results[index] = InsufficientBalance(len(days), balances[employee_id])
+                else:
+                    balances[employee_id] -= len(days)
+                    pending.update(days)
+                    results[index] = balances[employee_id]
+            conn.executemany("UPDATE employees SET balance = ? WHERE id = ?",
+                             [(balance, employee_id) for employee_id, balance in balances.items()
+                              if balance != original[employee_id]])
+            conn.executemany("INSERT INTO leave_days (employee_id, day) VALUES (?, ?)",
+                             [(employee_id, day) for employee_id, days in new_days.items() for day in days])
+        return results
+
+    def add_employee(self, employee_id: str, balance: int, history: Iterable[str] = ()):
+        self.bulk_load([(employee_id, balance, history)])
+
+    def remove_employee(self, employee_id: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM employees WHERE id = ?", (employee_id,))
+
+    def bulk_load(self, records: Iterable[Tuple[str, int, Iterable[str]]], batch_size: int = 10_000):
+        """Insert or replace many employees, committing once per batch"""
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self._load_batch(batch)
+                batch = []
+        if batch:
+            self._load_batch(batch)
+
+    def _load_batch(self, batch):
+        with self.transaction() as conn:
+            ids = [(employee_id,) for employee_id, _, _ in batch]
+            conn.executemany("DELETE FROM employees WHERE id = ?", ids)
+            conn.executemany("INSERT INTO employees (id, balance) VALUES (?, ?)",
+                             [(employee_id, balance) for employee_id, balance, _ in batch])
+            conn.executemany("INSERT OR IGNORE INTO leave_days (employee_id, day) VALUES (?, ?)",
+                             [(employee_id, to_ordinal(day)) for employee_id, _, history in batch for day in history])
+
+    def seed(self, employees: Dict[str, dict]):
+        """Load initial data only into an empty store, so restarts keep applied leaves"""
+        if self.is_empty():
+            self.bulk_load((emp_id, data["balance"], data["history"]) for emp_id, data in employees.items())
+
+    def close(self):
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+        self.keepalive.close()
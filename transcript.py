@@ -0,0 +1,181 @@
+"""
+Append-only session transcript: utterances, recognized text and MCP responses.
+
+Every message posted to message_queue can be recorded. A record is a
+length-prefixed JSON object: a 4-byte little-endian length, then the UTF-8
+JSON. Each record carries "t", the seconds since the session started on the
+monotonic clock, so replays keep the recorded spacing even if the wall clock
+jumps. Each session opens with a {"type": "session"} record holding the wall-clock
+start time. Records are encoded and written by a background thread in
+batches, so producers only pay for appending to a list.
+
+Replay feeds the recorded user utterances back through process_voice_command
+at the recorded pace (or as fast as possible) and reports a latency profile:
+
+    python transcript.py session.transcript [--speed 2] [--max-speed] [--output profile.json]
+"""
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+LENGTH = struct.Struct("<I")
+FORMAT_VERSION = 1
+
+def encode(record: Dict[str, Any]) -> bytes:
+    payload = json.dumps(record, separators=(",", ":"), default=str).encode()
+    return LENGTH.pack(len(payload)) + payload
+
+class TranscriptWriter:
+    """Buffered, append-only transcript writer with a background flush thread"""
+
+    def __init__(self, path: str, flush_interval: float = 0.2, batch_size: int = 256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.file = open(path, "ab")
+        self.origin = time.monotonic()
+        self.pending: List[Dict[str, Any]] = []
+        self.ready = threading.Condition()
+        self.closed = False
+        self.written = 0
+        self.record({"type": "session", "version": FORMAT_VERSION, "started_at": datetime.now().isoformat()})
+        self.thread = threading.Thread(target=self._write, name="transcript-writer", daemon=True)
+        self.thread.start()
+
+    def record(self, entry: Dict[str, Any]):
+        """Stamp and queue a record; safe to call from any thread"""
+        stamped = dict(entry)
+        stamped["t"] = round(time.monotonic() - self.origin, 6)
+        with self.ready:
+            self.pending.append(stamped)
+            if len(self.pending) >= self.batch_size:
+                self.ready.notify()
+
+    def _write(self):
+        """Writer thread: encode and append whatever accumulated, then flush"""
+        while True:
+            with self.ready:
+                if not self.pending and not self.closed:
+                    self.ready.wait(self.flush_interval)
+                batch, self.pending = self.pending, []
+                closed = self.closed
+            if batch:
+                self.file.write(b"".join(encode(record) for record in batch))
+                self.file.flush()
+                self.written += len(batch)
+            elif closed:
+                break
+
+    def close(self):
+        """Flush everything recorded so far and close the file"""
+        with self.ready:
+            self.closed = True
+            self.ready.notify()
+        self.thread.join()
+        self.file.close()
+
+def read_transcript(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield records in order; a record cut off by a crash ends the stream"""
+    with open(path, "rb") as file:
+        while True:
+            header = file.read(LENGTH.size)
+            if len(header) < LENGTH.size:
+                return
+            (length,) = LENGTH.unpack(header)
+            payload = file.read(length)
+            if len(payload) < length:
+                return
+            yield json.loads(payload)
+
+def utterances(records: Iterator[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The user utterances of the last session in a transcript"""
+    selected = []
+    for record in records:
+        if record.get("type") == "session":
+            selected = []
+        elif record.get("source") == "user":
+            selected.append(record)
+    return selected
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def replay(records: List[Dict[str, Any]], process: Callable[[str], Any],
+           speed: Optional[float] = 1.0) -> Dict[str, Any]:
+    """Feed utterances through process (which returns a future) and profile their latency
+
+    With a speed factor the recorded spacing is kept (speed=2 plays twice as
+    fast) and commands overlap as they did live; with speed=None each command
+    is issued as soon as the previous one has answered.
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    done = threading.Semaphore(0)
+
+    def finished(future, issued):
+        nonlocal errors
+        elapsed = time.perf_counter() - issued
+        with lock:
+            latencies.append(elapsed)
+            if future.cancelled() or future.exception() is not None:
+                errors += 1
+        done.release()
+
+    start = time.perf_counter()
+    first = records[0]["t"] if records else 0.0
+    for record in records:
+        if speed:
+            delay = (record["t"] - first) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        issued = time.perf_counter()
+        future = process(record["content"])
+        future.add_done_callback(lambda f, issued=issued: finished(f, issued))
+        if not speed:
+            done.acquire()
+    if speed:
+        for _ in records:
+            done.acquire()
+    elapsed = time.perf_counter() - start
+    return {
+        "utterances": len(records),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(records) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 3),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded session through process_voice_command")
+    parser.add_argument("path", help="transcript written with --transcript")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed factor for recorded spacing")
+    parser.add_argument("--max-speed", action="store_true", help="issue each command as soon as the last answered")
+    parser.add_argument("--output", help="write the latency profile here instead of stdout")
+    args = parser.parse_args()
+
+    # Replays must not touch the real leave database unless asked to
+    os.environ.setdefault("LEAVE_DB", ":memory:")
+    from server import process_voice_command
+
+    records = utterances(read_transcript(args.path))
+    report = replay(records, process_voice_command, None if args.max_speed else args.speed)
+    report["transcript"] = args.path
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
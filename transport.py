@@ -0,0 +1,299 @@
+"""
+MCP JSON-RPC transports for SimpleMCP.
+
+Requests are newline-delimited JSON-RPC 2.0 messages. Every request on a
+connection is handled in its own task, so a client can pipeline many request
+ids and receive responses as they complete (not necessarily in order).
+Tool calls run on the SimpleMCP tool loop (synchronous tools on its thread
+pool) and batches and resource reads on a bounded thread pool here, so one
+slow tool cannot stall the event loop.
+"""
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from metrics import metrics
+
+PROTOCOL_VERSION = "2024-11-05"
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+class JsonRpcError(Exception):
+    """Raised by method handlers to produce a JSON-RPC error response"""
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+def error_response(request_id, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+class JsonRpcDispatcher:
+    """Request validation, notifications and error mapping for a table of JSON-RPC methods
+
+    Subclasses add their methods to self.methods as coroutines taking the
+    request params; initialize and ping are answered here.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.methods: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {
+            "initialize": self.initialize,
+            "ping": self.ping,
+        }
+
+    async def initialize(self, params):
+        return {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {"tools": {}, "resources": {}},
+            "serverInfo": {"name": self.name, "version": "0.1.0"},
+        }
+
+    async def ping(self, params):
+        return {}
+
+    async def handle(self, message: Any) -> Optional[Any]:
+        """Handle one decoded message (or batch); returns the response or None"""
+        if isinstance(message, list):
+            if not message:
+                return error_response(None, INVALID_REQUEST, "Empty batch.")
+            responses = await asyncio.gather(*(self.handle_one(m) for m in message))
+            responses = [r for r in responses if r is not None]
+            return responses or None
+        return await self.handle_one(message)
+
+    async def handle_one(self, message: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or "method" not in message:
+            return error_response(message.get("id") if isinstance(message, dict) else None,
+                                  INVALID_REQUEST, "Invalid request.")
+        request_id = message.get("id")
+        is_notification = "id" not in message
+        method = self.methods.get(message["method"])
+        if method is None:
+            if is_notification:
+                return None
+            return error_response(request_id, METHOD_NOT_FOUND, f"Method '{message['method']}' not found.")
+        params = message.get("params") or {}
+        try:
+            result = await method(params)
+        except JsonRpcError as e:
+            return None if is_notification else error_response(request_id, e.code, e.message)
+        except Exception as e:
+            return None if is_notification else error_response(request_id, INTERNAL_ERROR, str(e))
+        if is_notification:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    async def handle_raw(self, data) -> Optional[str]:
+        """Decode one wire message, handle it and encode the response"""
+        try:
+            message = json.loads(data)
+        except ValueError as e:
+            return json.dumps(error_response(None, PARSE_ERROR, f"Parse error: {e}"))
+        response = await self.handle(message)
+        return None if response is None else json.dumps(response)
+
+    def close(self):
+        pass
+
+class JsonRpcHandler(JsonRpcDispatcher):
+    """Dispatches MCP JSON-RPC methods to a SimpleMCP instance"""
+
+    def __init__(self, mcp, max_workers: int = 8):
+        super().__init__(mcp.name)
+        self.mcp = mcp
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-tool")
+        self.methods.update({
+            "tools/list": self.tools_list,
+            "tools/call": self.tools_call,
+            "tools/call_batch": self.tools_call_batch,
+            "cache/stats": self.cache_stats,
+            "metrics/get": self.metrics_get,
+            "resources/list": self.resources_list,
+            "resources/templates/list": self.resource_templates_list,
+            "resources/read": self.resources_read,
+        })
+
+    async def tools_list(self, params):
+        return {"tools": [
+            {"name": name, "description": invoker.description, "inputSchema": invoker.input_schema}
+            for name, invoker in self.mcp.tool_invokers.items()
+        ]}
+
+    async def tools_call(self, params):
+        name = params.get("name")
+        arguments = params.get("arguments") or {}
+        invoker = self.mcp.tool_invokers.get(name)
+        if invoker is None:
+            raise JsonRpcError(INVALID_PARAMS, f"Tool '{name}' not found.")
+        if not isinstance(arguments, dict):
+            raise JsonRpcError(INVALID_PARAMS, "Tool arguments must be an object.")
+        try:
+            # Tools run on the SimpleMCP tool loop, which applies their timeout and concurrency limit
+            result = await asyncio.wrap_future(self.mcp.submit_tool(name, **arguments))
+        except Exception as e:
+            # Tool failures are reported in the result, not as protocol errors
+            return {"content": [{"type": "text", "text": f"Error: {e}"}], "isError": True}
+        return {"content": [{"type": "text", "text": str(result)}], "isError": False}
+
+    async def tools_call_batch(self, params):
+        """Non-standard extension: many tool calls in one request, e.g. for HR imports"""
+        calls = params.get("calls")
+        if not isinstance(calls, list):
+            raise JsonRpcError(INVALID_PARAMS, "calls must be a list of {name, arguments} objects.")
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self.executor, self.mcp.execute_batch, calls)
+        return {"results": [{"content": [{"type": "text", "text": str(result)}]} for result in results]}
+
+    async def cache_stats(self, params):
+        """Non-standard extension: result cache hit/miss counters and single-flight coalescing"""
+        stats = self.mcp.cache.stats()
+        stats["coalesced_calls"] = self.mcp.coalesced
+        return stats
+
+    async def metrics_get(self, params):
+        """Non-standard extension: per-stage latency summaries (empty unless metrics are enabled)"""
+        return metrics.snapshot()
+
+    async def resources_list(self, params):
+        # All registered resources are templates; there are no static URIs
+        return {"resources": []}
+
+    async def resource_templates_list(self, params):
+        return {"resourceTemplates": [
+            {"uriTemplate": pattern, "name": func.__name__, "description": func.__doc__ or ""}
+            for pattern, func in self.mcp.resources.items()
+        ]}
+
+    async def resources_read(self, params):
+        uri = params.get("uri")
+        if not isinstance(uri, str):
+            raise JsonRpcError(INVALID_PARAMS, "Missing resource uri.")
+        scheme = uri.partition("://")[0]
+        if scheme not in self.mcp.resource_index:
+            raise JsonRpcError(INVALID_PARAMS, f"Resource '{uri}' not found.")
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(self.executor, self.mcp.read_resource, uri)
+        return {"contents": [{"uri": uri, "mimeType": "text/plain", "text": str(text)}]}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class Connection:
+    """Runs pipelined requests for one client with a cap on in-flight requests"""
+
+    def __init__(self, handler: JsonRpcDispatcher, send, max_in_flight: int = 64):
+        self.handler = handler
+        self.send = send
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.send_lock = asyncio.Lock()
+        self.tasks = set()
+
+    async def submit(self, data):
+        # Waiting for a slot applies backpressure to the reader
+        await self.slots.acquire()
+        task = asyncio.create_task(self._run(data))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, data):
+        try:
+            response = await self.handler.handle_raw(data)
+            if response is not None:
+                async with self.send_lock:
+                    await self.send(response)
+        except Exception as e:
+            print(f"Error handling request: {e}", file=sys.stderr)
+        finally:
+            self.slots.release()
+
+    async def drain(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+async def serve_stdio(handler: JsonRpcDispatcher):
+    """Serve newline-delimited JSON-RPC on stdin/stdout"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=2 ** 22)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    async def send(response: str):
+        sys.stdout.write(response + "\n")
+        sys.stdout.flush()
+
+    connection = Connection(handler, send)
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.strip():
+            await connection.submit(line)
+    await connection.drain()
+
+async def serve_tcp(handler: JsonRpcDispatcher, host: str, port: int):
+    """Serve newline-delimited JSON-RPC over plain TCP sockets"""
+    async def on_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def send(response: str):
+            writer.write(response.encode() + b"\n")
+            await writer.drain()
+
+        connection = Connection(handler, send)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    await connection.submit(line)
+            await connection.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(on_client, host, port, limit=2 ** 22)
+    async with server:
+        await server.serve_forever()
+
+async def serve_websocket(handler: JsonRpcDispatcher, host: str, port: int):
+    """Serve JSON-RPC over WebSocket, one message per frame"""
+    import websockets
+
+    async def on_client(websocket):
+        connection = Connection(handler, websocket.send)
+        try:
+            async for message in websocket:
+                await connection.submit(message)
+            await connection.drain()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async with websockets.serve(on_client, host, port):
+        await asyncio.Future()
+
+async def serve(mcp, transport: str = "stdio", host: str = "127.0.0.1", port: int = 8000,
+                max_workers: int = 8):
+    """Serve a SimpleMCP instance over the named transport"""
+    await serve_handler(JsonRpcHandler(mcp, max_workers=max_workers), transport, host, port)
+
+async def serve_handler(handler: JsonRpcDispatcher, transport: str = "stdio", host: str = "127.0.0.1",
+                        port: int = 8000):
+    """Serve any JsonRpcDispatcher (e.g. workers.ShardRouter)"""
+    try:
+        if transport == "stdio":
+            await serve_stdio(handler)
+        elif transport == "tcp":
+            await serve_tcp(handler, host, port)
+        elif transport == "websocket":
+            await serve_websocket(handler, host, port)
+        else:
+            raise ValueError(f"Unknown transport '{transport}'")
+    finally:
+        handler.close()
@@ -0,0 +1,166 @@
+"""
+Wake-word gating in front of the full speech recognizer.
+
+Every utterance the VAD segments is first checked by a cheap keyword
+spotter (by default PocketSphinx in keyword-spotting mode, or a Vosk model
+restricted to a tiny grammar). Only utterances that contain the wake phrase
+("leave manager ...") reach the full recognizer. After an addressed
+utterance a follow-up window stays open, so "leave manager, check balance
+for E001" can be followed by "and the history" without repeating it.
+
+Gating runs on its own thread in utterance order, so the capture loop never
+waits on the spotter. Counters record how many full recognizer invocations
+the gate saved.
+"""
+import queue
+import re
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import Any, Dict, Optional
+
+import speech_recognition as sr
+
+from recognizers import RecognitionPool, create_backend
+
+def normalize(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def default_spotter_options(backend: str, phrase: str, sensitivity: float = 0.85) -> Dict[str, Any]:
+    """Options that make a backend cheap and focused on the wake phrase
+
+    sensitivity is speech_recognition's 0..1 keyword scale (higher spots
+    more, with more false wakes); 0.85 is a pocketsphinx threshold of 1e-25.
+    """
+    phrase = normalize(phrase)
+    if not 0.0 <= sensitivity <= 1.0:
+        raise ValueError(f"wake word sensitivity must be between 0 and 1, got {sensitivity}")
+    if backend == "sphinx":
+        return {"keyword_entries": [(phrase, sensitivity)]}
+    if backend == "vosk":
+        return {"grammar": [phrase, "[unk]"]}
+    return {}
+
+class WakeWordGate:
+    """Passes utterances to the recognizer pool only when addressed
+
+    submit() returns a future for the transcript with the wake phrase
+    stripped: None when the utterance was not addressed (nothing should be
+    shown), "" when it held only the wake phrase.
+    """
+
+    def __init__(self, phrase: str = "leave manager", spotter: str = "sphinx",
+                 spotter_options: Optional[Dict[str, Any]] = None, follow_up: float = 8.0):
+        self.phrase = normalize(phrase)
+        self.spotter_name = spotter
+        self.spotter_options = spotter_options if spotter_options is not None \
+            else default_spotter_options(spotter, self.phrase)
+        self.spotter = None
+        self.follow_up = follow_up
+        # Drops everything up to and including the wake phrase ("hey leave manager, ...")
+        self.strip = re.compile(r"^.*?\b" + r"\W+".join(map(re.escape, self.phrase.split())) + r"\b\W*",
+                                re.IGNORECASE | re.DOTALL)
+        self.awake_until = 0.0
+        self.pool: Optional[RecognitionPool] = None
+        self.pending = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.utterances = 0
+        self.spotted = 0
+        self.follow_ups = 0
+        self.skipped = 0
+        self.recognized = 0
+
+    def start(self, pool: RecognitionPool):
+        self.pool = pool
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="wake-word", daemon=True)
+            self.thread.start()
+
+    def is_awake(self) -> bool:
+        """Whether the follow-up window of the last addressed utterance is still open"""
+        return time.perf_counter() < self.awake_until
+
+    def submit(self, utterance) -> Future:
+        """Queue an audio.Utterance for gating"""
+        result = Future()
+        self.pending.put((utterance, result))
+        return result
+
+    def close(self, wait: bool = True):
+        """Stop the gate thread; wait=False cancels utterances not yet gated"""
+        if self.thread is None:
+            return
+        if not wait:
+            while True:
+                try:
+                    _, result = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                result.cancel()
+        self.pending.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        """Gate thread: spot the wake phrase in each utterance, in order"""
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            utterance, result = item
+            if not result.set_running_or_notify_cancel():
+                continue
+            try:
+                self.gate(utterance, result)
+            except Exception as e:
+                result.set_exception(e)
+
+    def gate(self, utterance, result: Future):
+        with self.lock:
+            self.utterances += 1
+        audio = utterance.audio
+        if utterance.detected_at < self.awake_until:
+            with self.lock:
+                self.follow_ups += 1
+        else:
+            if self.spotter is None:
+                self.spotter = create_backend(self.spotter_name, **self.spotter_options)
+            try:
+                heard = normalize(self.spotter.recognize(audio))
+            except sr.UnknownValueError:
+                heard = ""
+            if self.phrase not in heard:
+                with self.lock:
+                    self.skipped += 1
+                result.set_result(None)
+                return
+            with self.lock:
+                self.spotted += 1
+        # The window runs from the end of the last addressed utterance
+        self.awake_until = utterance.detected_at + self.follow_up
+        with self.lock:
+            self.recognized += 1
+        self.pool.submit(audio).add_done_callback(lambda future: self.finish(future, result))
+
+    def finish(self, future: Future, result: Future):
+        if future.cancelled():
+            # result is already running (run() claimed it), so cancel() would be a no-op
+            result.set_exception(CancelledError())
+            return
+        error = future.exception()
+        if error is not None:
+            result.set_exception(error)
+            return
+        result.set_result(self.strip.sub("", future.result(), count=1).strip())
+
+    def stats(self) -> Dict[str, int]:
+        """Utterances seen, wake words spotted, follow-ups let through and recognizer calls saved"""
+        with self.lock:
+            return {
+                "utterances": self.utterances,
+                "wake_words": self.spotted,
+                "follow_ups": self.follow_ups,
+                "recognizer_calls": self.recognized,
+                "recognizer_calls_saved": self.skipped,
+            }
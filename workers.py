@@ -0,0 +1,332 @@
+"""
+Multi-process worker mode: N headless servers behind one endpoint.
+
+    python server.py --headless --workers 4 --transport tcp --port 8000
+
+One SimpleMCP process holds one GIL, so tool throughput stops at a single
+core however many clients connect. In worker mode the front process only
+parses requests and routes them; each worker is a `server.py --headless`
+process on stdio that owns one shard of the employees (by a stable hash of
+the id, see store.shard_of) in its own SQLite file, so no two processes
+ever touch the same employee.
+
+* tools/call goes to the worker owning the employee_id argument (calls
+  without one are spread round-robin).
+* tools/call_batch is scattered: each worker gets its part of the batch in
+  one request, and the results are gathered back into the original order.
+* cache/stats is summed over the workers; metrics/get lists each worker.
+
+Requests are pipelined to the workers over their stdin/stdout, with ids
+rewritten per worker.
+
+Which files hold the live data is recorded next to the database
+(leaves.layout.json: the shard count, 0 for the single file). Starting with
+another worker count, or resharding offline with
+`python workers.py leaves.db --shards N` (0 merges back into one file),
+copies every employee from the live files into the new layout. A
+single-process server refuses to open a database whose data lives in
+shards.
+"""
+import asyncio
+import functools
+import glob
+import itertools
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional
+
+from store import LeaveStore, shard_of
+from transport import INTERNAL_ERROR, INVALID_PARAMS, JsonRpcDispatcher, JsonRpcError, serve_handler
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+
+def shard_paths(path: str, shards: int) -> List[str]:
+    """One database file per shard next to path, e.g. leaves.db -> leaves.shard0-of-4.db"""
+    if path == ":memory:":
+        return [path] * shards
+    root, ext = os.path.splitext(path)
+    return [f"{root}.shard{index}-of-{shards}{ext}" for index in range(shards)]
+
+class LayoutError(Exception):
+    """The database files on disk do not say which layout holds the live data"""
+
+def layout_path(database: str) -> str:
+    """Where the live layout of database is recorded, e.g. leaves.db -> leaves.layout.json"""
+    return f"{os.path.splitext(database)[0]}.layout.json"
+
+def layout_paths(database: str, shards: int) -> List[str]:
+    """The files of a layout: the database itself for 0 shards"""
+    return shard_paths(database, shards) if shards else [database]
+
+def read_layout(database: str) -> Optional[int]:
+    try:
+        with open(layout_path(database), encoding="utf-8") as f:
+            return int(json.load(f)["shards"])
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError) as e:
+        raise LayoutError(f"Unreadable layout file {layout_path(database)}: {e}") from e
+
+def write_layout(database: str, shards: int):
+    path = layout_path(database)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"shards": shards}, f)
+    os.replace(path + ".tmp", path)
+
+def modified(paths: List[str]) -> float:
+    """Latest modification time of SQLite files, including their write-ahead logs"""
+    times = [os.path.getmtime(path) for base in paths for path in (base, base + "-wal") if os.path.exists(path)]
+    return max(times, default=0.0)
+
+def existing_layouts(database: str) -> Dict[int, List[str]]:
+    """Shard files on disk next to database, by shard count"""
+    root, ext = os.path.splitext(database)
+    layouts: Dict[int, List[str]] = {}
+    for path in glob.glob(f"{glob.escape(root)}.shard*-of-*{glob.escape(ext)}"):
+        match = re.fullmatch(r"\.shard\d+-of-(\d+)", path[len(root):len(path) - len(ext)])
+        if match:
+            layouts.setdefault(int(match.group(1)), []).append(path)
+    return layouts
+
+def current_layout(database: str) -> int:
+    """Shard count of the files holding database's live data (0: the database itself)
+
+    Must be read before the database is opened, since opening it writes to it.
+    Raises LayoutError if shard files of another layout are newer than the
+    live files, as their leaves would otherwise be silently ignored.
+    """
+    if database == ":memory:":
+        return 0
+    recorded = read_layout(database)
+    live = recorded or 0
+    # Databases sharded before the layout was recorded fall back to file times
+    newer = sorted(shards for shards, paths in existing_layouts(database).items()
+                   if shards != live and modified(paths) > modified(layout_paths(database, live)))
+    if recorded is None and len(newer) == 1:
+        return newer[0]
+    if newer:
+        raise LayoutError(
+            f"Shard files for {' and '.join(map(str, newer))} workers are newer than the live "
+            f"{'single-process database' if not live else f'{live}-worker shards'} of {database}. "
+            f"Move the files that are out of date away before starting.")
+    return live
+
+def require_single(database: str, layout: int):
+    """Refuse to serve a sharded database from one process, which would only see stale data"""
+    if layout:
+        raise LayoutError(
+            f"{database} is split into {layout} worker shards ({layout_path(database)}). Start with "
+            f"--workers {layout}, or merge the shards back first: python workers.py {database} --shards 0")
+
+def remove_database(path: str):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def copy_employees(sources: List[str], targets: List[str], batch_size: int = 10_000):
+    """Replace the contents of targets with every employee of sources, each in the target that owns it"""
+    stores = [LeaveStore(path) for path in targets]
+    try:
+        for target in stores:
+            with target.transaction() as conn:
+                conn.execute("DELETE FROM employees")
+        batches: List[list] = [[] for _ in stores]
+        for path in sources:
+            source = LeaveStore(path)
+            try:
+                for emp_id in source.employee_ids():
+                    shard = shard_of(emp_id, len(stores))
+                    batches[shard].append((emp_id, source.get_balance(emp_id), source.get_history(emp_id) or []))
+                    if len(batches[shard]) >= batch_size:
+                        stores[shard].bulk_load(batches[shard])
+                        batches[shard] = []
+            finally:
+                source.close()
+        for target, batch in zip(stores, batches):
+            if batch:
+                target.bulk_load(batch)
+    finally:
+        for target in stores:
+            target.close()
+
+def prepare_layout(database: str, shards: int, current: Optional[int] = None):
+    """Move the live data of database into the layout with this many shards (0: one file)
+
+    The new layout is recorded only once every employee is copied, so an
+    interrupted reshard starts over from the same live files; the files of
+    the old shard layout are removed after that.
+    """
+    if database == ":memory:":
+        return
+    if current is None:
+        current = current_layout(database)
+    if current != shards:
+        copy_employees(layout_paths(database, current), layout_paths(database, shards))
+    write_layout(database, shards)
+    if current and current != shards:
+        for path in shard_paths(database, current):
+            remove_database(path)
+
+class Worker:
+    """One `server.py --headless` process on stdio with pipelined requests"""
+
+    def __init__(self, index: int, process: asyncio.subprocess.Process):
+        self.index = index
+        self.process = process
+        self.ids = itertools.count(1)
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.reader = asyncio.create_task(self.read())
+
+    @classmethod
+    async def start(cls, index: int, shards: int, database: str) -> "Worker":
+        env = dict(os.environ)
+        env["LEAVE_DB"] = database
+        env["VOICE_MCP_SHARD"] = f"{index}/{shards}"
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, SERVER, "--headless", "--transport", "stdio",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, env=env, limit=2 ** 22)
+        return cls(index, process)
+
+    async def read(self):
+        """Resolve pending requests as their responses arrive, in any order"""
+        try:
+            while True:
+                line = await self.process.stdout.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.pending.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(JsonRpcError(INTERNAL_ERROR, f"Worker {self.index} exited."))
+            self.pending.clear()
+
+    async def call(self, method: str, params: Dict[str, Any]) -> Any:
+        """Send one request and return its result; errors are raised as JsonRpcError"""
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        self.process.stdin.write(json.dumps(message).encode() + b"\n")
+        await self.process.stdin.drain()
+        response = await future
+        if "error" in response:
+            raise JsonRpcError(response["error"]["code"], response["error"]["message"])
+        return response["result"]
+
+    async def close(self):
+        self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), 5)
+        except asyncio.TimeoutError:
+            self.process.kill()
+        await asyncio.gather(self.reader, return_exceptions=True)
+
+class ShardRouter(JsonRpcDispatcher):
+    """JSON-RPC handler that routes MCP requests to the worker owning the employee"""
+
+    def __init__(self, name: str, workers: List[Worker], key: str = "employee_id"):
+        super().__init__(name)
+        self.workers = workers
+        self.key = key
+        self.spread = itertools.cycle(workers)
+        # Tool and resource listings are the same on every worker
+        self.listings: Dict[str, Any] = {}
+        # Generic handlers take the method name first, to pass it on to the workers
+        routes = {
+            "tools/list": self.listing,
+            "resources/list": self.listing,
+            "resources/templates/list": self.listing,
+            "tools/call": self.tools_call,
+            "tools/call_batch": self.tools_call_batch,
+            "resources/read": self.forward,
+            "cache/stats": self.cache_stats,
+            "metrics/get": self.metrics_get,
+        }
+        self.methods.update({name: functools.partial(route, name) for name, route in routes.items()})
+
+    def owner(self, arguments: Any) -> Worker:
+        emp_id = arguments.get(self.key) if isinstance(arguments, dict) else None
+        if isinstance(emp_id, str):
+            return self.workers[shard_of(emp_id, len(self.workers))]
+        return next(self.spread)
+
+    async def listing(self, method, params):
+        if method not in self.listings:
+            self.listings[method] = await self.workers[0].call(method, params)
+        return self.listings[method]
+
+    async def forward(self, method, params):
+        return await next(self.spread).call(method, params)
+
+    async def tools_call(self, method, params):
+        return await self.owner(params.get("arguments")).call(method, params)
+
+    async def tools_call_batch(self, method, params):
+        """Scatter the batch by owning worker and gather the results in call order"""
+        calls = params.get("calls")
+        if not isinstance(calls, list):
+            raise JsonRpcError(INVALID_PARAMS, "calls must be a list of {name, arguments} objects.")
+        parts: Dict[int, List[int]] = {}
+        for index, call in enumerate(calls):
+            worker = self.owner(call.get("arguments") if isinstance(call, dict) else None)
+            parts.setdefault(worker.index, []).append(index)
+        replies = await asyncio.gather(*(
+            self.workers[worker].call(method, {"calls": [calls[index] for index in indexes]})
+            for worker, indexes in parts.items()
+        ))
+        results: List[Any] = [None] * len(calls)
+        for indexes, reply in zip(parts.values(), replies):
+            for index, result in zip(indexes, reply["results"]):
+                results[index] = result
+        return {"results": results}
+
+    async def cache_stats(self, method, params):
+        shards = await asyncio.gather(*(worker.call(method, params) for worker in self.workers))
+        totals = {key: sum(shard[key] for shard in shards)
+                  for key, value in shards[0].items() if isinstance(value, int)}
+        lookups = totals.get("hits", 0) + totals.get("misses", 0)
+        totals["hit_rate"] = round(totals.get("hits", 0) / lookups, 3) if lookups else 0.0
+        totals["workers"] = len(shards)
+        return totals
+
+    async def metrics_get(self, method, params):
+        return {"workers": await asyncio.gather(*(worker.call(method, params) for worker in self.workers))}
+
+async def serve_sharded(workers: int, transport: str = "tcp", host: str = "127.0.0.1", port: int = 8000,
+                        database: Optional[str] = None, name: str = "LeaveManager", layout: Optional[int] = None):
+    """Start the workers and serve one endpoint in front of them until the transport closes
+
+    layout is the current_layout() read before this process opened the
+    database, if it did.
+    """
+    database = database or os.environ.get("LEAVE_DB", "leaves.db")
+    prepare_layout(database, workers, layout)
+    paths = shard_paths(database, workers)
+    started = await asyncio.gather(*(Worker.start(index, workers, path) for index, path in enumerate(paths)))
+    router = ShardRouter(name, list(started))
+    try:
+        # Fail fast if a worker cannot start
+        await asyncio.gather(*(worker.call("ping", {}) for worker in started))
+        print(f"{name} MCP Server is running ({transport}, {workers} workers)...", file=sys.stderr)
+        await serve_handler(router, transport, host, port)
+    finally:
+        await asyncio.gather(*(worker.close() for worker in started))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Reshard a leave database offline")
+    parser.add_argument("database", nargs="?", default=os.environ.get("LEAVE_DB", "leaves.db"))
+    parser.add_argument("--shards", type=int, required=True, help="worker count to split into, 0 for one file")
+    args = parser.parse_args()
+    if args.shards < 0:
+        parser.error("--shards must be 0 or more")
+    try:
+        prepare_layout(args.database, args.shards)
+    except LayoutError as e:
+        parser.error(str(e))